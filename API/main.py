@@ -1,8 +1,17 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from typing import Optional
+import math
 import sqlite3
 
-app = FastAPI(title="Books API")
+from monitoring import metrics
+from monitoring.metrics import timed
+from storage.export import BATCH_SIZE, EXPORT_FORMATS, has_column, iter_export, normalize_timestamp
+
+# ORJSONResponse serializes rows straight to bytes instead of going through
+# jsonable_encoder + json.dumps on every response.
+app = FastAPI(title="Books API", default_response_class=ORJSONResponse)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -14,71 +23,160 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Added last so it wraps CORS and measures the whole request; METRICS_ENABLED=0 skips it
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 DB_PATH = "storage/library.db"
 
+# Columns of the books table that may be requested through `fields=`
+BOOK_COLUMNS = (
+    "id", "isbn", "title", "author", "description", "source", "year",
+    "acc_date", "place_publisher", "poster_url", "book_url", "updated_at",
+)
+
 def get_db_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row 
     return conn
 
+def require_updated_at():
+    """Raise 400 if the database predates the updated_at column (pipeline.py --db adds it)."""
+    conn = get_db_connection()
+    try:
+        if not has_column(conn, "updated_at"):
+            raise HTTPException(status_code=400, detail="Database has no updated_at column; run pipeline.py --db")
+    finally:
+        conn.close()
+
+def parse_fields(fields: Optional[str]) -> Optional[list]:
+    """Turn a comma separated `fields=` value into a list of book columns.
+
+    Returns None (every column) when no projection is requested. Unknown names
+    are rejected so the list can be interpolated into the SQL column list safely,
+    and `updated_at` is rejected on databases that do not have it yet, before
+    any query runs or a stream starts.
+    """
+    if not fields:
+        return None
+
+    columns = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [c for c in columns if c not in BOOK_COLUMNS]
+    if unknown or not columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(BOOK_COLUMNS)}"
+        )
+    if "updated_at" in columns:
+        require_updated_at()
+    return columns
+
+def column_list(columns: Optional[list]) -> str:
+    """SQL column list for a parse_fields() result."""
+    return ", ".join(columns) if columns else "*"
+
 @app.get("/api/health")
 def health_check():
     return {"status": "API is running"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Expose request, stage and cache metrics in Prometheus text format."""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 ## Find Book By ISBN
 
 @app.get("/books/{isbn}")
-def get_book_by_isbn(isbn: str):
+def get_book_by_isbn(isbn: str, fields: Optional[str] = None):
+    columns = parse_fields(fields)
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        "SELECT * FROM books WHERE isbn = ?",
-        (isbn,)
-    )
-    book = cursor.fetchone()
+    with timed("sqlite_query"):
+        cursor.execute(
+            f"SELECT {column_list(columns)} FROM books WHERE isbn = ?",
+            (isbn,)
+        )
+        book = cursor.fetchone()
     conn.close()
 
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    return dict(book)
+    return ORJSONResponse(dict(book))
 
 ## Search by author or book name
 
 @app.get("/search")
-def search_books(q: str):
+def search_books(q: str, fields: Optional[str] = None):
+    columns = parse_fields(fields)
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT *
-        FROM books
-        WHERE title LIKE ? OR author LIKE ?
-        LIMIT 20
-    """, (f"%{q}%", f"%{q}%"))
+    with timed("sqlite_query"):
+        cursor.execute(f"""
+            SELECT {column_list(columns)}
+            FROM books
+            WHERE title LIKE ? OR author LIKE ?
+            LIMIT 20
+        """, (f"%{q}%", f"%{q}%"))
 
-    results = cursor.fetchall()
+        results = cursor.fetchall()
     conn.close()
 
-    return [dict(r) for r in results]
+    # Returning the response directly skips FastAPI's jsonable_encoder pass
+    return ORJSONResponse([dict(r) for r in results])
 
 @app.get("/random-books")
-def get_random_books():
+def get_random_books(fields: Optional[str] = None):
     """Fetch 10 random books from the database."""
+    columns = parse_fields(fields)
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM books ORDER BY RANDOM() LIMIT 10")
-        results = cursor.fetchall()
-        return [dict(r) for r in results]
+        with timed("sqlite_query"):
+            cursor.execute(f"SELECT {column_list(columns)} FROM books ORDER BY RANDOM() LIMIT 10")
+            results = cursor.fetchall()
+        return ORJSONResponse([dict(r) for r in results])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         conn.close()
 
+## Bulk export
+
+@app.get("/export")
+def export_books(
+    fmt: str = Query("ndjson", alias="format"),
+    fields: Optional[str] = None,
+    updated_since: Optional[str] = None,
+    batch_size: int = Query(BATCH_SIZE, ge=1, le=10000),
+):
+    """Stream the books table as NDJSON or CSV in fixed-size batches."""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    columns = parse_fields(fields)
+
+    since = None
+    if updated_since:
+        try:
+            since = normalize_timestamp(updated_since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="updated_since must be an ISO 8601 date or datetime")
+        require_updated_at()
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+    return StreamingResponse(
+        iter_export(DB_PATH, columns, fmt, since, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="books.{fmt}"'},
+    )
+
 ## Recommendation System
 
+import os
 import sys
 from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
@@ -87,24 +185,96 @@ from recommender.recommender import BookRecommender
 
 recommender_engine = BookRecommender()
 
-@app.on_event("startup")
-def load_recommender():
-    """Load recommender model on startup to reduce latency for first request."""
-    # We wrap in try-except in case embeddings aren't built yet
+# Under gunicorn's preload_app the model is loaded here, in the master, so the
+# forked workers share its pages instead of each loading a copy (gunicorn.conf.py)
+if os.getenv("PRELOAD_RECOMMENDER", "").lower() in ("1", "true", "yes"):
     try:
         recommender_engine.load()
-        print("Recommender model loaded successfully.")
     except Exception as e:
         print(f"Warning: Could not load recommender model: {e}")
 
+# Seconds clients are told to wait while the recommender is warming up
+RECOMMENDER_RETRY_AFTER = 5
+
+@app.on_event("startup")
+def load_recommender():
+    """Warm the recommender up in the background so the SQLite endpoints serve immediately."""
+    if not recommender_engine.loaded:
+        recommender_engine.load_in_background()
+
+@app.on_event("shutdown")
+def save_query_cache():
+    """Persist cached query embeddings so a restarted server comes back warm."""
+    try:
+        recommender_engine.save_query_cache()
+    except Exception as e:
+        print(f"Warning: Could not save query cache: {e}")
+
+@app.get("/api/ready")
+def readiness_check():
+    """Readiness probe: 200 once the recommender is loaded, 503 with load progress until then.
+
+    Polling it also retries a failed load once its backoff has passed.
+    """
+    recommender_engine.retry_if_due()
+    status = recommender_engine.status()
+    return ORJSONResponse(status, status_code=200 if status["state"] == "ready" else 503)
+
+def require_recommender():
+    """Raise 503 with Retry-After unless the recommender is loaded.
+
+    A failed load is retried in the background, with backoff, by the first
+    request after its retry delay has passed.
+    """
+    if not recommender_engine.loaded:
+        if recommender_engine.state == "failed" and not recommender_engine.retry_if_due():
+            retry_in = recommender_engine.retry_in()
+            # None: another request has just started the retry
+            if retry_in is not None:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Recommender unavailable: {recommender_engine.error}",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_in)))},
+                )
+        raise HTTPException(
+            status_code=503,
+            detail="Recommender is still loading",
+            headers={"Retry-After": str(RECOMMENDER_RETRY_AFTER)},
+        )
+
 @app.get("/recommend")
-def recommend_books(query: str):
-    """Get book recommendations based on semantic search."""
+def recommend_books(
+    query: str,
+    fields: Optional[str] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    has_poster: Optional[bool] = None,
+    author: Optional[str] = None,
+):
+    """Get book recommendations based on semantic search, optionally restricted by filters."""
+    columns = parse_fields(fields)
+    if year_min is not None and year_max is not None and year_min > year_max:
+        raise HTTPException(status_code=400, detail="year_min must not be greater than year_max")
+    filters = {"year_min": year_min, "year_max": year_max, "has_poster": has_poster, "author": author}
+    require_recommender()
+    try:
+        results = recommender_engine.recommend(query, fields=columns, filters=filters)
+        return ORJSONResponse(results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Recommendation failed: {str(e)}")
+
+@app.get("/books/{isbn}/similar")
+def similar_books(isbn: str, limit: int = Query(6, ge=1, le=50), fields: Optional[str] = None):
+    """Books similar to `isbn`, from its stored vector; no query encoding."""
+    columns = parse_fields(fields)
+    require_recommender()
     try:
-        results = recommender_engine.recommend(query)
-        return results
+        results = recommender_engine.similar(isbn, top_k=limit, fields=columns)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Recommendation failed: {str(e)}")
+    if results is None:
+        raise HTTPException(status_code=404, detail="Book not found in the embedding store")
+    return ORJSONResponse(results)
 
 # Serve static files from the frontend directory
 # This must be the last route to allow other API routes to take precedence
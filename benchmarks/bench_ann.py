@@ -0,0 +1,99 @@
+"""Recall-vs-latency of the ANN backends against exact search.
+
+Builds every installed backend (hnswlib for hnsw, faiss-cpu for ivfpq) over
+either a clustered synthetic catalog or an existing store, then sweeps the
+query-time knob (ef / nprobe) and reports recall@k against ExactIndex and
+median query latency.
+
+Usage:
+    python benchmarks/bench_ann.py --rows 1000000
+    python benchmarks/bench_ann.py --store recommender/index
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from recommender.ann import BACKENDS, ExactIndex
+from recommender.scoring import BLOCK_ROWS, normalize
+from recommender.store import open_store
+
+KNOBS = {"hnsw": ("set_ef", [16, 32, 64, 128, 256]), "ivfpq": ("set_nprobe", [1, 4, 16, 64, 128])}
+
+
+def synthetic(rows: int, dim: int, clusters: int = 1000) -> np.ndarray:
+    """Unit vectors drawn around random topic centres, closer to real embeddings than pure noise."""
+    rng = np.random.default_rng(0)
+    centres = normalize(rng.standard_normal((clusters, dim), dtype=np.float32))
+    vectors = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, BLOCK_ROWS):
+        n = min(BLOCK_ROWS, rows - start)
+        noise = rng.standard_normal((n, dim), dtype=np.float32) * 0.06
+        vectors[start:start + n] = normalize(centres[rng.integers(0, clusters, n)] + noise)
+    return vectors
+
+
+def measure(index, queries, truth, k):
+    times, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found, _ = index.search(q, k)
+        times.append((time.perf_counter() - start) * 1000)
+        hits += len(set(found.tolist()) & expected)
+    return float(np.median(times)), hits / (k * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall/latency benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--store", type=Path, help="benchmark an existing store instead of synthetic data")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.store:
+        manifest, vectors, _ = open_store(args.store)
+    else:
+        vectors = synthetic(args.rows, args.dim)
+        manifest = {"dim": args.dim, "count": args.rows}
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(vectors.shape[0], size=args.queries, replace=False)
+    # Perturbed catalog vectors, like a query that describes an existing book
+    queries = [normalize(np.asarray(vectors[i], dtype=np.float32)
+                         + rng.standard_normal(vectors.shape[1], dtype=np.float32) * 0.03) for i in picks]
+
+    exact = ExactIndex(vectors)
+    truth = [set(exact.search(q, args.k)[0].tolist()) for q in queries]
+    exact_ms, _ = measure(exact, queries, truth, args.k)
+    print(f"{'backend':<8} {'knob':>10} {'recall@' + str(args.k):>10} {'median ms':>10}")
+    print(f"{'exact':<8} {'-':>10} {1.0:>10.3f} {exact_ms:>10.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, backend in BACKENDS.items():
+            try:
+                start = time.perf_counter()
+                backend.build(vectors, Path(tmp))
+                build_s = time.perf_counter() - start
+                index = backend.load(Path(tmp), manifest, vectors=vectors)
+            except ImportError as e:
+                print(f"{name:<8} skipped ({e})")
+                continue
+            setter, values = KNOBS[name]
+            for value in values:
+                getattr(index, setter)(value)
+                ms, recall = measure(index, queries, truth, args.k)
+                knob = f"{setter[4:]}={value}"
+                print(f"{name:<8} {knob:>10} {recall:>10.3f} {ms:>10.2f}")
+            print(f"{name:<8} build time {build_s:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Author boost lookup: per-request linear scan vs AuthorIndex.
+
+Generates a synthetic catalog of author names (1M books by default), checks
+that AuthorIndex.match() returns exactly the rows of the old scan
+(`query in author.lower()` over every book) and reports per-query latency
+of both, plus the index build time.
+
+Usage:
+    python benchmarks/bench_author_index.py [--rows 1000000]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from recommender.author_index import AuthorIndex
+
+FIRST = ["john", "mary", "r k", "james", "anita", "vikram", "j r r", "agatha", "stephen", "chetan",
+         "arundhati", "george", "jane", "salman", "ruskin", "amish", "sudha", "william", "isaac", "neil"]
+LAST = ["tolkien", "rowling", "king", "christie", "bhagat", "roy", "orwell", "austen", "rushdie", "bond",
+        "tripathi", "murty", "shakespeare", "asimov", "gaiman", "narayan", "seth", "desai", "ghosh", "kumar"]
+QUERIES = ["tolkien", "rowling", "stephen king", "roy", "ghosh", "kumar 17", "xyzzy", "aga", "neil gai"]
+
+
+def synthetic_authors(rows: int) -> list:
+    rng = random.Random(0)
+    pool = [f"{rng.choice(FIRST)} {rng.choice(LAST)} {i}" if i % 3 else f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+            for i in range(max(1, rows // 5))]
+    return [rng.choice(pool) if rng.random() > 0.02 else None for _ in range(rows)]
+
+
+def linear_scan(authors, query):
+    """The previous per-request loop in BookRecommender.recommend."""
+    return [row for row, author in enumerate(authors) if author and query in author.lower()]
+
+
+def median_ms(fn, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[repeat // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Author index benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    authors = synthetic_authors(args.rows)
+    start = time.perf_counter()
+    index = AuthorIndex(authors)
+    print(f"Indexed {args.rows} rows / {len(index.names)} distinct authors in {time.perf_counter() - start:.2f}s")
+
+    print(f"{'query':<14} {'matches':>8} {'scan ms':>9} {'index ms':>9} {'first 56 ms':>12}")
+    for query in QUERIES:
+        start = time.perf_counter()
+        expected = linear_scan(authors, query)
+        scan_ms = (time.perf_counter() - start) * 1000
+
+        full_ms, rows = median_ms(lambda: index.match(query))
+        assert rows.tolist() == expected, f"mismatch for {query!r}"
+        # recommend() asks for top_k + semantic candidates (6 + 50) rows
+        limited_ms, rows = median_ms(lambda: index.match(query, limit=56))
+        assert rows.tolist() == expected[:56], f"limited mismatch for {query!r}"
+        print(f"{query:<14} {len(expected):>8} {scan_ms:>9.1f} {full_ms:>9.3f} {limited_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
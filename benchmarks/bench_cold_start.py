@@ -0,0 +1,108 @@
+"""Cold-start time and RSS: legacy embeddings.pkl vs the mmap vector store.
+
+Each variant is loaded in a fresh interpreter, which reports the load time
+and its RSS growth right after loading and after one full scoring pass
+(the first query touches every page of the mapped vectors). Model loading is
+identical for both formats and is not included.
+
+Usage:
+    python benchmarks/bench_cold_start.py --synthetic 28000
+    python benchmarks/bench_cold_start.py --pickle recommender/embeddings.pkl --store recommender/index
+"""
+import argparse
+import json
+import pickle
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CHILD = r"""
+import json, pickle, resource, sys, time
+import numpy as np
+sys.path.insert(0, {root!r})
+from recommender.store import open_store
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+base = rss_mb()
+start = time.perf_counter()
+if {kind!r} == "pickle":
+    with open({path!r}, "rb") as f:
+        data = pickle.load(f)
+    vectors = data["embeddings"]
+else:
+    manifest, vectors, ids = open_store({path!r})
+load_s = time.perf_counter() - start
+loaded = rss_mb() - base
+
+query = np.ones(vectors.shape[1], dtype=np.float32)
+for block in range(0, vectors.shape[0], 65536):
+    np.asarray(vectors[block:block + 65536], dtype=np.float32) @ query
+print(json.dumps({{"load_s": load_s, "rss_loaded_mb": loaded, "rss_scanned_mb": rss_mb() - base}}))
+"""
+
+
+def run_child(kind: str, path: Path) -> dict:
+    code = CHILD.format(root=str(ROOT), kind=kind, path=str(path))
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def build_synthetic(rows: int, dim: int, workdir: Path):
+    """Write a legacy pickle (with metadata, as build_embeddings used to) and float32/float16 stores."""
+    import numpy as np
+    from recommender.store import write_store
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((rows, dim), dtype=np.float32)
+    ids = [f"{9780000000000 + i}" for i in range(rows)]
+    description = "A synthetic description of typical length for the catalog. " * 12
+    metadatas = [
+        {"isbn": isbn, "title": f"Title {i}", "author": f"author {i % 5000}", "year": 2000,
+         "poster_url": f"https://covers.example/{i}.jpg", "book_url": f"https://books.example/{i}",
+         "description": description}
+        for i, isbn in enumerate(ids)
+    ]
+    pickle_path = workdir / "embeddings.pkl"
+    with open(pickle_path, "wb") as f:
+        pickle.dump({"ids": ids, "metadatas": metadatas, "embeddings": embeddings,
+                     "model_name": "all-MiniLM-L6-v2"}, f)
+    write_store(ids, embeddings, "all-MiniLM-L6-v2", workdir / "index_f32", dtype="float32")
+    write_store(ids, embeddings, "all-MiniLM-L6-v2", workdir / "index_f16", dtype="float16")
+    return {"pickle": pickle_path, "store float32": workdir / "index_f32", "store float16": workdir / "index_f16"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding cold-start benchmark")
+    parser.add_argument("--synthetic", type=int, help="generate N synthetic rows instead of using real files")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--pickle", type=Path)
+    parser.add_argument("--store", type=Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.synthetic:
+            variants = build_synthetic(args.synthetic, args.dim, Path(tmp))
+        else:
+            variants = {}
+            if args.pickle:
+                variants["pickle"] = args.pickle
+            if args.store:
+                variants["store"] = args.store
+
+        print(f"{'variant':<16} {'load s':>8} {'RSS loaded MB':>14} {'RSS scanned MB':>15}")
+        for name, path in variants.items():
+            r = run_child("pickle" if name == "pickle" else "store", path)
+            print(f"{name:<16} {r['load_s']:>8.3f} {r['rss_loaded_mb']:>14.1f} {r['rss_scanned_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
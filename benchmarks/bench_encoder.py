@@ -0,0 +1,140 @@
+"""Query encoding latency: torch SentenceTransformer vs ONNX Runtime (fp32 / int8).
+
+Each backend runs in a fresh interpreter, which reports import + load time,
+RSS after the single-query run, median / p95 latency of single-query encodes (what
+/recommend does on a cache miss) and batch throughput on book-length texts.
+Embeddings of the same texts are compared with the torch ones to report
+parity (min / mean cosine).
+
+Needs an export from recommender/export_onnx.py (--quantize for onnx-int8).
+
+Usage:
+    python benchmarks/bench_encoder.py
+    python benchmarks/bench_encoder.py --threads 1 --backends torch onnx-int8
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from recommender.encoders import ENCODER_BACKENDS, ONNX_DIR, parity
+
+CHILD = r"""
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+if {threads}:
+    os.environ["RECOMMENDER_THREADS"] = str({threads})
+import numpy as np
+from recommender.encoders import load_encoder
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+encoder = load_encoder({backend!r}, {model!r}, {onnx_dir!r})
+if {backend!r} == "torch" and {threads}:
+    import torch
+    torch.set_num_threads({threads})
+load_s = time.perf_counter() - start
+
+with open({texts_path!r}) as f:
+    texts = json.load(f)
+queries = texts["queries"]
+encoder.encode(queries[:5])
+latencies = []
+for q in queries:
+    t = time.perf_counter()
+    encoder.encode([q])
+    latencies.append((time.perf_counter() - t) * 1000)
+serving_rss = rss_mb()
+
+t = time.perf_counter()
+books = encoder.encode(texts["books"], batch_size=64)
+batch_s = time.perf_counter() - t
+np.save({out_path!r}, books)
+print(json.dumps({{
+    "load_s": load_s, "rss_mb": serving_rss, "p50_ms": float(np.median(latencies)),
+    "p95_ms": float(np.percentile(latencies, 95)), "texts_per_s": len(texts["books"]) / batch_s,
+}}))
+"""
+
+QUERY_WORDS = ["space", "robot", "mystery", "victorian", "detective", "romance", "history", "dragons",
+               "cooking", "war", "poetry", "friendship", "ocean", "murder", "science", "children"]
+
+
+def sample_texts(db_path: Path, books: int, queries: int) -> dict:
+    """Book texts from the database (synthetic if it is missing) and short two/three-word queries."""
+    rng = np.random.default_rng(0)
+    book_texts = []
+    if db_path.exists():
+        import sqlite3
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute(
+            "SELECT title, description FROM books WHERE description IS NOT NULL AND description != '' LIMIT ?",
+            (books,),
+        ).fetchall()
+        conn.close()
+        book_texts = [f"{title or ''}: {description}" for title, description in rows]
+    while len(book_texts) < books:
+        words = rng.choice(QUERY_WORDS, size=int(rng.integers(20, 120)))
+        book_texts.append(f"Title {len(book_texts)}: " + " ".join(words))
+    query_texts = [" ".join(rng.choice(QUERY_WORDS, size=int(rng.integers(2, 4)))) for _ in range(queries)]
+    return {"books": book_texts, "queries": query_texts}
+
+
+def run_child(backend: str, args, texts_path: Path, out_path: Path) -> dict:
+    code = CHILD.format(root=str(ROOT), backend=backend, model=args.model, onnx_dir=str(args.onnx_dir),
+                        threads=args.threads, texts_path=str(texts_path), out_path=str(out_path))
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query encoder latency and parity benchmark")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-dir", type=Path, default=ONNX_DIR)
+    parser.add_argument("--backends", nargs="+", choices=ENCODER_BACKENDS, default=list(ENCODER_BACKENDS))
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads (0: library default)")
+    parser.add_argument("--books", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--db", type=Path, default=ROOT / "storage" / "library.db")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        texts_path = tmp / "texts.json"
+        texts_path.write_text(json.dumps(sample_texts(args.db, args.books, args.queries)))
+
+        print(f"{'backend':<10} {'load s':>7} {'RSS MB':>7} {'p50 ms':>7} {'p95 ms':>7} {'texts/s':>8} "
+              f"{'min cos':>8} {'mean cos':>9}")
+        reference = None
+        for backend in args.backends:
+            out_path = tmp / f"{backend}.npy"
+            try:
+                r = run_child(backend, args, texts_path, out_path)
+            except RuntimeError as e:
+                print(f"{backend:<10} skipped: {e}")
+                continue
+            vectors = np.load(out_path)
+            if backend == "torch":
+                reference = vectors
+            cos = parity(reference, vectors) if reference is not None else None
+            cos_cols = f"{cos.min():>8.4f} {cos.mean():>9.4f}" if cos is not None else f"{'-':>8} {'-':>9}"
+            print(f"{backend:<10} {r['load_s']:>7.2f} {r['rss_mb']:>7.0f} {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} "
+                  f"{r['texts_per_s']:>8.0f} {cos_cols}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Sustained rows/sec and peak RSS of the /export stream.
+
+Builds a synthetic books database (1M rows by default) unless one with
+exactly --rows rows already exists at --db, and drains storage.export.iter_export() for each format, which is what
+the endpoint streams to the client.
+
+Usage:
+    python benchmarks/bench_export.py [--rows 1000000] [--db /tmp/export_bench.db]
+"""
+import argparse
+import resource
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from storage.export import EXPORT_FORMATS, iter_export
+
+
+def count_rows(db_path: Path):
+    """Rows in the books table of `db_path`, or None if there is no usable database."""
+    if not db_path.exists():
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+
+def build_db(db_path: Path, rows: int) -> None:
+    db_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        isbn TEXT UNIQUE,
+        title TEXT NOT NULL,
+        author TEXT,
+        description TEXT,
+        source TEXT,
+        year INTEGER,
+        acc_date TEXT,
+        place_publisher TEXT,
+        poster_url TEXT,
+        book_url TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""")
+    description = "A synthetic description used to give rows a realistic width. " * 8
+    batch = 50_000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO books (isbn, title, author, description, source, year, acc_date,"
+            " place_publisher, poster_url, book_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (f"{9780000000000 + i}", f"Synthetic Title {i}", f"author {i % 5000}", description,
+                 "openlibrary", 1950 + i % 75, "01-01-2001", "New Delhi: Publisher",
+                 f"https://covers.example/{i}.jpg", f"https://books.example/{i}")
+                for i in range(start, min(start + batch, rows))
+            ],
+        )
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/export throughput benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", default="/tmp/export_bench.db")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    # Throughput is reported per --rows, so a leftover database of another size is rebuilt
+    if count_rows(db_path) != args.rows:
+        print(f"Building {args.rows} row database at {db_path}...")
+        build_db(db_path, args.rows)
+
+    for fmt in EXPORT_FORMATS:
+        start = time.perf_counter()
+        total_bytes = 0
+        for chunk in iter_export(db_path, None, fmt, batch_size=args.batch_size):
+            total_bytes += len(chunk)
+        elapsed = time.perf_counter() - start
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{fmt:<7} {args.rows / elapsed:>10,.0f} rows/s  {total_bytes / elapsed / 1e6:>7.1f} MB/s"
+              f"  peak RSS {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
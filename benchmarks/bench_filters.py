@@ -0,0 +1,84 @@
+"""Filtered vector search: post-filtering the top 50 vs masks inside the kernel.
+
+On synthetic vectors with random years and poster flags, times one query
+for filters of decreasing selectivity:
+    unfiltered   exact top-50, the baseline cost
+    post-filter  exact top-50, then drop rows failing the filter (the old
+                 way); reports how many of the 50 survive
+    kernel       scoring.search with the compiled RowFilter, which always
+                 returns 50 matching rows
+Filter compilation is timed separately; BookRecommender caches compiled filters.
+
+Usage:
+    python benchmarks/bench_filters.py --rows 1000000
+    python benchmarks/bench_filters.py --rows 1000000 --int8
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from recommender.filters import Facets, compile_filter
+from recommender.scoring import normalize, quantize_int8, search
+
+FILTERS = {
+    "has_poster": {"has_poster": True},
+    "year >= 1990": {"year_min": 1990},
+    "1990s": {"year_min": 1990, "year_max": 1999},
+    "1995 + poster": {"year_min": 1995, "year_max": 1995, "has_poster": True},
+}
+
+
+def median_ms(fn, repeats: int) -> float:
+    fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered search benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--int8", action="store_true", help="scan the int8 copy and re-rank, as RECOMMENDER_INT8=1")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = np.empty((args.rows, args.dim), dtype=np.float32)
+    for start in range(0, args.rows, 100_000):
+        block = rng.standard_normal((min(100_000, args.rows - start), args.dim), dtype=np.float32)
+        vectors[start:start + len(block)] = normalize(block)
+    int8_vectors = quantize_int8(vectors)[0] if args.int8 else None
+    # Years skewed towards recent books, ~70% with a poster
+    years = np.clip(2024 - rng.exponential(25, args.rows).astype(int), 1800, 2024).tolist()
+    facets = Facets(years, (rng.random(args.rows) < 0.7).tolist())
+    query = normalize(rng.standard_normal(args.dim, dtype=np.float32))
+
+    base = median_ms(lambda: search(vectors, query, 50, int8_vectors), args.repeats)
+    print(f"{args.rows} rows x {args.dim}{' int8' if args.int8 else ''}; unfiltered top-50: {base:.1f} ms")
+    print(f"{'filter':<15} {'match %':>8} {'compile ms':>10} {'post-filter ms':>15} {'kept':>5} {'kernel ms':>10}")
+    for name, spec in FILTERS.items():
+        compile_ms = median_ms(lambda: compile_filter(facets, **spec), 5)
+        row_filter = compile_filter(facets, **spec)
+
+        def post_filter():
+            rows, _ = search(vectors, query, 50, int8_vectors)
+            return rows[row_filter.mask[rows]]
+
+        kept = len(post_filter())
+        post_ms = median_ms(post_filter, args.repeats)
+        kernel_ms = median_ms(lambda: search(vectors, query, 50, int8_vectors, row_filter), args.repeats)
+        print(f"{name:<15} {100 * row_filter.fraction:>8.2f} {compile_ms:>10.2f} {post_ms:>15.1f} {kept:>5} "
+              f"{kernel_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
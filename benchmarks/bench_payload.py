@@ -0,0 +1,99 @@
+"""Payload size and serialization time per endpoint.
+
+Compares the old responses (every column, FastAPI's jsonable_encoder +
+json.dumps) against projected rows serialized with orjson, using the same
+queries the endpoints run against storage/library.db.
+
+/recommend is not measured: it already returns only the card fields
+(METADATA_FIELDS in recommender.py) that the frontend displays, so `fields=`
+does not shrink it.
+
+Usage:
+    python benchmarks/bench_payload.py [--db storage/library.db] [--q harry]
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import orjson
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:  # measure plain json.dumps when FastAPI is not installed
+    def jsonable_encoder(obj):
+        return obj
+
+# Columns requested by frontend/app.js
+CARD_FIELDS = ["isbn", "title", "author", "year", "poster_url", "book_url", "description"]
+
+
+def default_dumps(content) -> bytes:
+    """Mirror fastapi.responses.JSONResponse.render."""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def fetch(conn, sql, params=()):
+    return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+def endpoint_payloads(conn, q):
+    """Return {endpoint: (full_rows, projected_rows)} for the hot endpoints."""
+    cols = ", ".join(CARD_FIELDS)
+    like = (f"%{q}%", f"%{q}%")
+    search_sql = "SELECT {} FROM books WHERE title LIKE ? OR author LIKE ? LIMIT 20"
+    random_sql = "SELECT {} FROM books ORDER BY RANDOM() LIMIT 10"
+
+    full_random = fetch(conn, random_sql.format("*"))
+    isbns = [r["isbn"] for r in full_random]
+    projected_random = fetch(
+        conn,
+        f"SELECT {cols} FROM books WHERE isbn IN ({', '.join('?' * len(isbns))})",
+        isbns,
+    )
+
+    return {
+        "/search": (fetch(conn, search_sql.format("*"), like), fetch(conn, search_sql.format(cols), like)),
+        "/random-books": (full_random, projected_random),
+    }
+
+
+def time_dumps(dumps, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = dumps(content)
+    return (time.perf_counter() - start) / repeat * 1e6, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload size / serialization benchmark")
+    parser.add_argument("--db", default=str(ROOT / "storage" / "library.db"))
+    parser.add_argument("--q", default="the")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+
+    print(f"{'endpoint':<14} {'before bytes':>12} {'before us':>10} {'after bytes':>12} {'after us':>10}")
+    for endpoint, (full, projected) in endpoint_payloads(conn, args.q).items():
+        before_us, before_bytes = time_dumps(default_dumps, full, args.repeat)
+        after_us, after_bytes = time_dumps(orjson.dumps, projected, args.repeat)
+        print(f"{endpoint:<14} {before_bytes:>12} {before_us:>10.1f} {after_bytes:>12} {after_us:>10.1f}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Latency of "more like this": text query vs stored vector vs precomputed lists.
+
+For a sample of books, times
+    text         recommend(title) as the frontend used to do it: encodes the
+                 title (query cache off) and searches the index
+    vector       similar(isbn) scoring the book's stored vector
+    precomputed  similar(isbn) reading the book_neighbors table
+Each returns the same number of books with full metadata. The database is
+copied to a temporary directory, so the neighbour lists are only written to
+the copy.
+
+Usage:
+    python benchmarks/bench_similar.py
+    RECOMMENDER_ENCODER=onnx-int8 python benchmarks/bench_similar.py --samples 500
+"""
+import argparse
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import recommender.build_neighbors as build_neighbors
+import recommender.recommender as rec_module
+from recommender.query_cache import QueryEmbeddingCache
+
+
+def timed_ms(fn, items) -> np.ndarray:
+    fn(items[0])
+    out = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        out.append((time.perf_counter() - start) * 1000)
+    return np.array(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-books latency benchmark")
+    parser.add_argument("--db", type=Path, default=rec_module.DB_PATH)
+    parser.add_argument("--store", type=Path, default=rec_module.STORE_DIR)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = Path(tmp) / "library.db"
+        shutil.copy(args.db, db_copy)
+        rec_module.DB_PATH = build_neighbors.DB_PATH = db_copy
+        rec_module.STORE_DIR = build_neighbors.STORE_DIR = args.store
+
+        rec = rec_module.BookRecommender()
+        rec.load()
+        rec.query_cache = QueryEmbeddingCache(0, "")
+
+        rng = np.random.default_rng(0)
+        isbns = [str(i) for i in rng.choice(rec.ids, size=min(args.samples, len(rec.ids)), replace=False)]
+        conn = sqlite3.connect(db_copy)
+        titles = dict(conn.execute(
+            f"SELECT isbn, title FROM books WHERE isbn IN ({', '.join('?' * len(isbns))})", isbns
+        ).fetchall())
+        conn.close()
+        isbns = [i for i in isbns if titles.get(i)]
+
+        results = {
+            "text": timed_ms(lambda i: rec.recommend(titles[i], top_k=args.top_k), isbns),
+            "vector": timed_ms(lambda i: rec.similar(i, top_k=args.top_k), isbns),
+        }
+        start = time.perf_counter()
+        build_neighbors.build_neighbors(max(args.top_k, build_neighbors.DEFAULT_NEIGHBORS))
+        build_s = time.perf_counter() - start
+        results["precomputed"] = timed_ms(lambda i: rec.similar(i, top_k=args.top_k), isbns)
+
+        print(f"{len(rec.ids)} books, {rec.index.name} search, {rec.encoder.name} encoder, "
+              f"{len(isbns)} samples; neighbour job took {build_s:.1f}s")
+        print(f"{'path':<12} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, ms in results.items():
+            print(f"{name:<12} {np.median(ms):>8.2f} {np.percentile(ms, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Micro-benchmark of the top-k scoring kernel.
+
+Compares, per query, the previous scoring path (cosine_similarity, which
+re-normalizes every book vector, then nan_to_num and a full argsort) with
+recommender.scoring.search on pre-normalized vectors, with and without the
+int8 scan + float re-rank. Recall@k of the int8 path is measured against
+exact search.
+
+Large sizes are generated into memory-mapped temp files; 5M x 384 float32
+needs ~7.7 GB of disk and page cache (use --dtype float16 to halve it).
+
+Usage:
+    python benchmarks/bench_topk.py --sizes 28000 1000000 5000000 --queries 20
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from recommender.scoring import BLOCK_ROWS, normalize, quantize_int8, search
+
+K = 50
+
+
+def make_vectors(n: int, dim: int, dtype: str, workdir: Path) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    vectors = np.lib.format.open_memmap(workdir / f"vectors_{n}.npy", mode="w+", dtype=dtype, shape=(n, dim))
+    for start in range(0, n, BLOCK_ROWS):
+        rows = min(BLOCK_ROWS, n - start)
+        vectors[start:start + rows] = normalize(rng.standard_normal((rows, dim), dtype=np.float32))
+    vectors.flush()
+    return vectors
+
+
+def baseline(matrix, query):
+    """The pre-kernel path: normalize all rows per query, nan_to_num, full argsort."""
+    try:
+        from sklearn.metrics.pairwise import cosine_similarity
+        scores = cosine_similarity(query[None, :], matrix).flatten()
+    except ImportError:
+        rows = np.asarray(matrix, dtype=np.float32)
+        scores = (rows / np.linalg.norm(rows, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    scores = np.nan_to_num(scores, nan=0.0, posinf=1.0, neginf=0.0)
+    return scores.argsort()[-K:][::-1]
+
+
+def time_ms(fn, queries):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        result = fn(q)
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-k scoring kernel benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[28_000, 1_000_000, 5_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", choices=("float32", "float16"), default="float32")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--skip-baseline-above", type=int, default=1_000_000,
+                        help="the old path copies the matrix per query; skip it for larger sizes")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    queries = [normalize(rng.standard_normal(args.dim, dtype=np.float32)) for _ in range(args.queries)]
+
+    print(f"{'rows':>10} {'baseline ms':>12} {'exact ms':>9} {'int8 ms':>8} {'int8 recall@50':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            vectors = make_vectors(n, args.dim, args.dtype, Path(tmp))
+            quantized, _ = quantize_int8(vectors)
+            search(vectors, queries[0], K)  # fault the pages in before timing
+
+            base_ms = float("nan")
+            if n <= args.skip_baseline_above:
+                base_ms, _ = time_ms(lambda q: baseline(vectors, q), queries)
+            exact_ms, _ = time_ms(lambda q: search(vectors, q, K), queries)
+            int8_ms, _ = time_ms(lambda q: search(vectors, q, K, quantized), queries)
+
+            recall = np.mean([
+                len(set(search(vectors, q, K)[0]) & set(search(vectors, q, K, quantized)[0])) / K
+                for q in queries
+            ])
+            print(f"{n:>10} {base_ms:>12.2f} {exact_ms:>9.2f} {int8_ms:>8.2f} {recall:>15.3f}")
+            del vectors, quantized
+
+
+if __name__ == "__main__":
+    main()
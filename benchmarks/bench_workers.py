@@ -0,0 +1,128 @@
+"""Throughput and memory scaling of the multi-worker serving mode.
+
+For each worker count, starts gunicorn with gunicorn.conf.py, waits for
+/api/ready, drives /recommend with concurrent keep-alive clients for a fixed
+duration and reports requests/sec plus the summed RSS and PSS of the master
+and its workers. PSS charges shared pages (preloaded model weights, the
+mapped vectors) proportionally, so it shows what each extra worker really
+costs. The query embedding cache is disabled, so every request encodes its
+query.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1 2 4 --duration 20 --clients 16
+"""
+import argparse
+import http.client
+import itertools
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from urllib.parse import quote
+
+ROOT = Path(__file__).resolve().parent.parent
+
+QUERIES = ["space adventure", "sad story about a robot", "history of india", "machine learning",
+           "tolkien", "data structures", "romantic comedy", "world war two"]
+
+
+def wait_ready(port: int, timeout: float = 300) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=2) as r:
+                if r.status == 200:
+                    return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("server did not become ready")
+
+
+def process_tree(pid: int) -> list:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    except FileNotFoundError:
+        pass
+    return pids
+
+
+def memory_mb(pids: list) -> tuple:
+    """Return (RSS, PSS) summed over pids, in MB, from /proc/<pid>/smaps_rollup."""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except FileNotFoundError:
+            pass
+    return rss / 1024, pss / 1024
+
+
+def load_test(port: int, clients: int, duration: float) -> int:
+    stop = time.time() + duration
+    counts = [0] * clients
+    queries = itertools.cycle(QUERIES)
+    lock = threading.Lock()
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while time.time() < stop:
+            with lock:
+                query = next(queries)
+            conn.request("GET", f"/recommend?query={quote(query)}")
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                counts[n] += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker scaling benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'req/s':>8} {'RSS MB':>8} {'PSS MB':>8}")
+    for n in args.workers:
+        # The query cache is off: the clients cycle a few queries, which would otherwise all be cache hits
+        env = {**os.environ, "WEB_CONCURRENCY": str(n), "PORT": str(args.port), "METRICS_ENABLED": "0",
+               "QUERY_CACHE_SIZE": "0"}
+        env.pop("RECOMMENDER_THREADS", None)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "API.main:app"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_ready(args.port)
+            load_test(args.port, args.clients, 3)  # warm-up
+            done = load_test(args.port, args.clients, args.duration)
+            rss, pss = memory_mb(process_tree(server.pid))
+            print(f"{n:>7} {done / args.duration:>8.1f} {rss:>8.0f} {pss:>8.0f}")
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
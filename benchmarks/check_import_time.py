@@ -0,0 +1,69 @@
+"""Check import-time budgets of the pipeline entry points with -X importtime.
+
+Each module is imported in a fresh interpreter. The check fails when its
+cumulative import time exceeds the budget or when it drags in one of the
+heavy ML packages that only the recommender should load.
+
+Usage:
+    python benchmarks/check_import_time.py
+Exits with status 1 when any budget is exceeded.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Packages that cost seconds / hundreds of MB and must stay lazy
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "sklearn")
+
+# module -> cumulative import budget in milliseconds
+BUDGETS_MS = {
+    "pipeline": 50,
+    "storage.db": 1500,
+    "transformation.transformation": 1500,
+    "API.main": 2000,
+}
+
+
+def import_profile(module: str) -> dict:
+    """Return {imported module: cumulative microseconds} for a fresh `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def main() -> int:
+    failures = 0
+    for module, budget_ms in BUDGETS_MS.items():
+        try:
+            profile = import_profile(module)
+        except RuntimeError as e:
+            print(f"ERROR {module}: {e}")
+            failures += 1
+            continue
+
+        elapsed_ms = profile.get(module, 0) / 1000
+        heavy = sorted({name.split(".")[0] for name in profile} & set(HEAVY_MODULES))
+        ok = elapsed_ms <= budget_ms and not heavy
+        failures += not ok
+        note = f" heavy imports: {', '.join(heavy)}" if heavy else ""
+        print(f"{'OK  ' if ok else 'FAIL'} {module:<32} {elapsed_ms:>8.1f} ms (budget {budget_ms} ms){note}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Synthetic library catalogs shaped like data/rae/RC_books.csv.
+
+Writes the ten accession-register columns that ingestion.load_library_data()
+reads, with valid ISBN-13s (ISBN-10s for a share of rows), a few duplicate
+and missing ISBNs, shared authors and plausible years. With --described it
+also writes the ingestion output (the same rows plus a `description`
+column), so transformation, the database import and the embedding build can
+be benchmarked at sizes where running ingestion itself is impractical.
+
+Descriptions come from synthetic_description(isbn), which the mock services
+(mock_services.py) also serve. That keeps the two paths consistent.
+
+Usage:
+    python benchmarks/generate_catalog.py --rows 100000 --out /tmp/catalog
+"""
+import argparse
+import csv
+import random
+import zlib
+from pathlib import Path
+
+COLUMNS = ["Acc_Date", "Acc_No", "Title", "ISBN", "Author_Editor",
+           "Edition_Volume", "Place_Publisher", "Year", "Pages", "Class_No"]
+# Placeholder written by ingestion when no source had a description
+NOT_FOUND = "Not Found"
+# Share of rows no description source knows about
+UNDESCRIBED_PERCENT = 15
+
+WORDS = (
+    "adventure ancient battle city dark dream empire family forest future garden ghost history "
+    "island journey kingdom light love machine memory mountain mystery night ocean planet "
+    "quest river robot secret shadow ship silent star storm stranger summer time tower "
+    "village war winter world young detective murder science magic dragon princess letter"
+).split()
+FIRST_NAMES = "anna arjun chen david elena farah george hana ivan julia kenji lucas maria nikhil olga priya".split()
+LAST_NAMES = "adams bose cruz dutta evans fischer gupta haddad ito jones khan lee mehta novak ortiz patel".split()
+PLACES = ["New Delhi: Penguin", "London: Macmillan", "New York: Harper", "Oxford: OUP",
+          "Mumbai: Rupa", "Boston: Little, Brown", "Chennai: Westland", "Cambridge: CUP"]
+
+
+def seed_of(text: str) -> int:
+    return zlib.crc32(text.encode())
+
+
+def bucket(isbn: str) -> int:
+    """Stable 0-99 bucket deciding which source (if any) describes a book."""
+    return seed_of(isbn) % 100
+
+
+def synthetic_description(isbn: str) -> str:
+    rng = random.Random(seed_of(isbn))
+    sentences = []
+    for _ in range(rng.randint(2, 8)):
+        words = rng.choices(WORDS, k=rng.randint(8, 20))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def isbn13(rng: random.Random) -> str:
+    digits = "978" + "".join(str(rng.randint(0, 9)) for _ in range(9))
+    check = (10 - sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(digits)) % 10) % 10
+    return digits + str(check)
+
+
+def isbn10(rng: random.Random) -> str:
+    digits = "".join(str(rng.randint(0, 9)) for _ in range(9))
+    check = (11 - sum(int(d) * (10 - i) for i, d in enumerate(digits)) % 11) % 11
+    return digits + ("X" if check == 10 else str(check))
+
+
+def catalog_rows(rows: int, seed: int = 0):
+    """Yield `rows` accession-register rows as dicts keyed by COLUMNS."""
+    rng = random.Random(seed)
+    authors = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(max(1, rows // 5))]
+    previous = []
+    for n in range(rows):
+        roll = rng.random()
+        if roll < 0.01:
+            isbn = ""
+        elif roll < 0.03 and previous:
+            isbn = rng.choice(previous)  # second copy of an earlier book
+        else:
+            isbn = isbn10(rng) if roll < 0.2 else isbn13(rng)
+            if len(previous) < 10_000:
+                previous.append(isbn)
+        yield {
+            "Acc_Date": f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(1995, 2024)}",
+            "Acc_No": 100000 + n,
+            "Title": " ".join(rng.choices(WORDS, k=rng.randint(1, 5))).title(),
+            "ISBN": isbn,
+            "Author_Editor": rng.choice(authors),
+            "Edition_Volume": rng.choice(["", "1st ed.", "2nd ed.", "Vol. 1", "Rev. ed."]),
+            "Place_Publisher": rng.choice(PLACES),
+            "Year": rng.randint(1950, 2024),
+            "Pages": rng.randint(80, 900),
+            "Class_No": f"{rng.randint(0, 999):03d}.{rng.randint(0, 99):02d}",
+        }
+
+
+def write_catalog(rows: int, out_dir: Path, described: bool = False, seed: int = 0) -> dict:
+    """Write RC_books.csv (and dau_with_description.csv with `described`) into out_dir; returns their paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {"catalog": out_dir / "RC_books.csv"}
+    if described:
+        paths["described"] = out_dir / "dau_with_description.csv"
+
+    with open(paths["catalog"], "w", newline="", encoding="latin1") as catalog_file:
+        catalog = csv.DictWriter(catalog_file, fieldnames=COLUMNS)
+        catalog.writeheader()
+        described_file = open(paths["described"], "w", newline="", encoding="latin1") if described else None
+        try:
+            if described_file:
+                described_writer = csv.DictWriter(described_file, fieldnames=COLUMNS + ["description"])
+                described_writer.writeheader()
+            for row in catalog_rows(rows, seed):
+                catalog.writerow(row)
+                if described_file:
+                    isbn = row["ISBN"]
+                    has_description = isbn and bucket(isbn) >= UNDESCRIBED_PERCENT
+                    description = synthetic_description(isbn) if has_description else NOT_FOUND
+                    described_writer.writerow({**row, "description": description})
+        finally:
+            if described_file:
+                described_file.close()
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic RC_books.csv catalog")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--out", type=Path, default=Path("data/synthetic"))
+    parser.add_argument("--described", action="store_true", help="also write the ingestion output CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for name, path in write_catalog(args.rows, args.out, args.described, args.seed).items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
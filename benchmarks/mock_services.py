@@ -0,0 +1,164 @@
+"""Local stand-ins for the description sources ingestion scrapes.
+
+One HTTP/1.1 server answers the URL shapes of all four sources, so
+ingestion can be benchmarked without touching the real sites:
+
+    /isbn/<isbn>.json         Open Library edition
+    /works/<key>.json         Open Library work (the edition's fallback)
+    /books?vid=ISBN<isbn>     Google Books page (div.Mhmsgc)
+    /book/c/<isbn>            Bookswagon page (div#aboutbook p)
+    /books/v1/volumes?q=...   Google Books API
+
+Which source describes a book is decided by generate_catalog.bucket(isbn),
+so every run sees the same hit rates and descriptions match the
+generator's --described output. Each response is delayed by --latency-ms
+(plus up to --jitter-ms), and --error-rate of the requests get a 503, which
+exercises ingestion's retry/backoff.
+
+Point ingestion at it with
+    OPENLIBRARY_URL=http://127.0.0.1:8900/openlibrary
+    GOOGLE_BOOKS_URL=http://127.0.0.1:8900/google
+    BOOKSWAGON_URL=http://127.0.0.1:8900/bookswagon
+    GOOGLE_BOOKS_API_URL=http://127.0.0.1:8900/googleapis
+(run_suite.py does this itself).
+
+Usage:
+    python benchmarks/mock_services.py --port 8900 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import html
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from generate_catalog import UNDESCRIBED_PERCENT, bucket, seed_of, synthetic_description
+
+# Upper bounds of the bucket ranges each source answers; books below
+# UNDESCRIBED_PERCENT are unknown everywhere
+OPENLIBRARY_UNTIL = 60
+OPENLIBRARY_WORKS_UNTIL = 70
+GOOGLE_HTML_UNTIL = 80
+BOOKSWAGON_UNTIL = 90
+# Share of Google API title queries that find a description
+GOOGLE_API_HIT_PERCENT = 50
+SOURCES = ("openlibrary", "google", "bookswagon", "googleapis")
+
+
+def page(body: str) -> str:
+    return f"<html><head><title>Book</title></head><body>{body}</body></html>"
+
+
+def openlibrary(path: str):
+    if path.startswith("/works/"):
+        isbn = path[len("/works/"):-len(".json")].removeprefix("W")
+        return 200, "application/json", json.dumps({"description": {"value": synthetic_description(isbn)}})
+    isbn = path[len("/isbn/"):-len(".json")]
+    b = bucket(isbn)
+    if UNDESCRIBED_PERCENT <= b < OPENLIBRARY_UNTIL:
+        return 200, "application/json", json.dumps({"title": "Book", "description": synthetic_description(isbn)})
+    if OPENLIBRARY_UNTIL <= b < OPENLIBRARY_WORKS_UNTIL:
+        return 200, "application/json", json.dumps({"title": "Book", "works": [{"key": f"/works/W{isbn}"}]})
+    return 404, "application/json", json.dumps({"error": "notfound"})
+
+
+def google_html(query: dict):
+    isbn = query.get("vid", [""])[0].removeprefix("ISBN")
+    if OPENLIBRARY_WORKS_UNTIL <= bucket(isbn) < GOOGLE_HTML_UNTIL:
+        return 200, "text/html", page(f'<div class="Mhmsgc">{html.escape(synthetic_description(isbn))}</div>')
+    return 200, "text/html", page("<div>No description</div>")
+
+
+def bookswagon(path: str):
+    isbn = path.rsplit("/", 1)[-1]
+    if GOOGLE_HTML_UNTIL <= bucket(isbn) < BOOKSWAGON_UNTIL:
+        return 200, "text/html", page(f'<div id="aboutbook"><p>{html.escape(synthetic_description(isbn))}</p></div>')
+    return 200, "text/html", page('<div id="aboutbook"></div>')
+
+
+def google_api(query: dict):
+    q = query.get("q", [""])[0]
+    if seed_of(q) % 100 < GOOGLE_API_HIT_PERCENT:
+        items = [{"volumeInfo": {"title": "Book", "description": synthetic_description(q)}}]
+        return 200, "application/json", json.dumps({"totalItems": 1, "items": items})
+    return 200, "application/json", json.dumps({"totalItems": 0})
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as ingestion's pooled sessions expect
+
+    def do_GET(self):
+        config = self.server.config
+        delay = config["latency_ms"] + config["rng"].uniform(0, config["jitter_ms"])
+        time.sleep(delay / 1000)
+        with self.server.lock:
+            self.server.requests += 1
+            failed = config["rng"].random() < config["error_rate"]
+        url = urlsplit(self.path)
+        source, _, rest = url.path.lstrip("/").partition("/")
+        rest = "/" + rest
+        query = parse_qs(url.query)
+        if failed:
+            status, content_type, body = 503, "text/plain", "unavailable"
+        elif source == "openlibrary":
+            status, content_type, body = openlibrary(rest)
+        elif source == "google":
+            status, content_type, body = google_html(query)
+        elif source == "bookswagon":
+            status, content_type, body = bookswagon(rest)
+        elif source == "googleapis":
+            status, content_type, body = google_api(query)
+        else:
+            status, content_type, body = 404, "text/plain", "unknown source"
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_services(port: int = 0, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                        seed: int = 0):
+    """Serve the mocks from a background thread; returns (server, {source: base_url}).
+
+    Stop it with server.shutdown(). `server.requests` counts requests served.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.config = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate,
+                     "rng": random.Random(seed)}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    return server, {source: f"{base}/{source}" for source in SOURCES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Open Library / Google Books / Bookswagon services")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server, urls = start_mock_services(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    for source, url in urls.items():
+        print(f"{source:<12} {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
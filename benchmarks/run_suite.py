@@ -0,0 +1,380 @@
+"""End-to-end benchmark suite: the data pipeline plus API load, written to JSON.
+
+For each catalog size, in a scratch directory:
+    generate        synthetic RC_books.csv and its ingestion output
+                    (generate_catalog.py)
+    ingestion       run_pipeline() on the first --ingest-rows rows against the
+                    local mock sources (mock_services.py) with the given
+                    latency and error rate
+    transformation  transformation() on the generated ingestion output
+    db              storage.db.main_db() into a fresh library.db
+    embeddings      build_embeddings.create_embeddings(full=True)
+    api             uvicorn serving API.main over that database and store;
+                    /search, /books/{isbn}, /random-books and /recommend are
+                    each driven by --clients keep-alive clients for --duration
+                    seconds and reported as QPS, p50 and p99
+
+Stages point the pipeline modules at the scratch directory by setting their
+path globals, the same way the pipeline reads them. A failing stage is
+recorded in the results and the run goes on. /recommend runs with the query
+embedding cache off, so every request encodes its query.
+
+Results go to benchmarks/results/<time>-<commit>.json with the commit,
+machine and options, and --compare prints the change between two result
+files:
+
+    python benchmarks/run_suite.py --sizes 10000 100000
+    python benchmarks/run_suite.py --sizes 1000000 --stages transformation db
+    python benchmarks/run_suite.py --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+from bench_workers import wait_ready
+from generate_catalog import WORDS, write_catalog
+from mock_services import start_mock_services
+
+STAGES = ("ingestion", "transformation", "db", "embeddings", "api")
+ENDPOINTS = ("search", "books", "random-books", "recommend")
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+CHILD = r"""
+import sys
+from pathlib import Path
+sys.path.insert(0, {root!r})
+import uvicorn
+import API.main as main
+import recommender.recommender as rec_module
+main.DB_PATH = {db!r}
+rec_module.DB_PATH = Path({db!r})
+rec_module.STORE_DIR = Path({store!r})
+uvicorn.run(main.app, host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+
+def git_commit() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def csv_rows(path: Path) -> int:
+    import pandas as pd
+    return len(pd.read_csv(path, encoding="latin-1", low_memory=False, usecols=[0]))
+
+
+def run_stage(name: str, fn) -> dict:
+    """Time fn(), which returns the number of rows it produced."""
+    print(f"[{name}] running...", flush=True)
+    start = time.perf_counter()
+    try:
+        rows = fn()
+    except Exception as e:
+        result = {"seconds": round(time.perf_counter() - start, 3), "error": f"{type(e).__name__}: {e}"}
+        print(f"[{name}] failed: {result['error']}", flush=True)
+        return result
+    seconds = time.perf_counter() - start
+    result = {"seconds": round(seconds, 3), "rows": rows, "rows_per_sec": round(rows / seconds, 1) if seconds else None}
+    print(f"[{name}] {seconds:.2f}s, {rows} rows", flush=True)
+    return result
+
+
+def ingestion_stage(workdir: Path, args) -> dict:
+    import ingestion.ingestion as ingestion
+
+    paths = write_catalog(args.ingest_rows, workdir / "ingest", seed=args.seed)
+    server, urls = start_mock_services(0, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    ingestion.INPUT_CSV = str(paths["catalog"])
+    ingestion.FINAL_OUTPUT = str(workdir / "ingest" / "dau_with_description.csv")
+    ingestion.OPENLIBRARY_URL = urls["openlibrary"]
+    ingestion.GOOGLE_BOOKS_URL = urls["google"]
+    ingestion.BOOKSWAGON_URL = urls["bookswagon"]
+    ingestion.GOOGLE_BOOKS_API_URL = urls["googleapis"]
+    try:
+        result = run_stage("ingestion", lambda: (ingestion.run_pipeline(), csv_rows(Path(ingestion.FINAL_OUTPUT)))[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+    result["requests"] = server.requests
+    return result
+
+
+def transformation_stage(workdir: Path, described: Path) -> dict:
+    import transformation.transformation as transformation
+
+    transformation.INPUT_CSV = str(described)
+    transformation.OUTPUT_CSV = str(workdir / "clean_description.csv")
+    return run_stage("transformation",
+                     lambda: (transformation.transformation(), csv_rows(Path(transformation.OUTPUT_CSV)))[1])
+
+
+def db_stage(workdir: Path) -> dict:
+    import storage.db as db
+
+    db.INPUT_CSV = workdir / "clean_description.csv"
+    db.DB_PATH = workdir / "library.db"
+    db.DB_PATH.unlink(missing_ok=True)
+
+    def run():
+        db.main_db()
+        conn = sqlite3.connect(db.DB_PATH)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+        finally:
+            conn.close()
+
+    return run_stage("db", run)
+
+
+def embeddings_stage(workdir: Path, args) -> dict:
+    import recommender.build_embeddings as build_embeddings
+    from recommender.store import open_store
+
+    build_embeddings.DB_PATH = workdir / "library.db"
+    build_embeddings.STORE_DIR = workdir / "index"
+    build_embeddings.BUILD_DIR = workdir / "index.build"
+    if args.model:
+        build_embeddings.MODEL_NAME = args.model
+
+    def run():
+        build_embeddings.create_embeddings(full=True, workers=args.workers, encoder=args.encoder)
+        return open_store(build_embeddings.STORE_DIR)[0]["count"]
+
+    result = run_stage("embeddings", run)
+    result["encoder"] = args.encoder
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_up(port: int, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError("API did not start")
+
+
+def load_test(port: int, paths: list, clients: int, duration: float) -> dict:
+    """Drive GET requests for `paths` (round robin) from keep-alive clients; returns QPS and latency percentiles."""
+    stop = time.perf_counter() + duration
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        i = n
+        while time.perf_counter() < stop:
+            path = paths[i % len(paths)]
+            i += clients
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                ok = False
+            latencies[n].append((time.perf_counter() - start) * 1000)
+            errors[n] += not ok
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    ms = np.concatenate([np.array(l) for l in latencies]) if any(latencies) else np.array([np.nan])
+    return {
+        "requests": int(sum(len(l) for l in latencies)),
+        "errors": int(sum(errors)),
+        "qps": round(sum(len(l) for l in latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def endpoint_paths(db_path: Path, seed: int) -> dict:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        isbns = [r[0] for r in conn.execute("SELECT isbn FROM books WHERE isbn IS NOT NULL ORDER BY RANDOM() LIMIT 1000")]
+    finally:
+        conn.close()
+    return {
+        "search": [f"/search?q={quote(rng.choice(WORDS))}" for _ in range(200)],
+        "books": [f"/books/{quote(isbn)}" for isbn in isbns],
+        "random-books": ["/random-books"],
+        "recommend": [f"/recommend?query={quote(' '.join(rng.sample(WORDS, 3)))}" for _ in range(200)],
+    }
+
+
+def api_stage(workdir: Path, args) -> dict:
+    db_path, store = workdir / "library.db", workdir / "index"
+    if not db_path.exists():
+        return {"error": f"FileNotFoundError: {db_path}"}
+    port = free_port()
+    code = CHILD.format(root=str(ROOT), db=str(db_path), store=str(store), port=port)
+    env = {**os.environ, "METRICS_ENABLED": "0", "QUERY_CACHE_SIZE": "0", "RECOMMENDER_ENCODER": args.encoder}
+    server = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = {}
+    try:
+        wait_up(port)
+        paths = endpoint_paths(db_path, args.seed)
+        for endpoint in args.endpoints:
+            if endpoint == "recommend":
+                if not store.exists():
+                    results[endpoint] = {"error": f"FileNotFoundError: {store}"}
+                    continue
+                try:
+                    wait_ready(port, timeout=600)
+                except TimeoutError as e:
+                    results[endpoint] = {"error": f"TimeoutError: {e}"}
+                    continue
+            load_test(port, paths[endpoint], args.clients, min(2.0, args.duration))  # warm-up
+            results[endpoint] = load_test(port, paths[endpoint], args.clients, args.duration)
+            r = results[endpoint]
+            print(f"[api] {endpoint:<13} {r['qps']:>8.1f} req/s  p50 {r['p50_ms']:.1f} ms  "
+                  f"p99 {r['p99_ms']:.1f} ms  errors {r['errors']}", flush=True)
+    except Exception as e:
+        results["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return results
+
+
+def run_size(size: int, workdir: Path, args) -> dict:
+    workdir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    paths = write_catalog(size, workdir, described=True, seed=args.seed)
+    result = {"generate": {"seconds": round(time.perf_counter() - start, 3), "rows": size}}
+    if "ingestion" in args.stages:
+        result["ingestion"] = ingestion_stage(workdir, args)
+    if "transformation" in args.stages:
+        result["transformation"] = transformation_stage(workdir, paths["described"])
+    if "db" in args.stages:
+        result["db"] = db_stage(workdir)
+    if "embeddings" in args.stages:
+        result["embeddings"] = embeddings_stage(workdir, args)
+    if "api" in args.stages:
+        result["api"] = api_stage(workdir, args)
+    return result
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Numeric leaves of a results tree keyed by dotted path."""
+    out = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            out.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[prefix + key] = value
+    return out
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    old, new = (json.loads(Path(p).read_text()) for p in (old_path, new_path))
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    old_metrics, new_metrics = flatten(old["results"]), flatten(new["results"])
+    print(f"{'metric':<45} {'old':>12} {'new':>12} {'change':>8}")
+    for key in sorted(old_metrics.keys() & new_metrics.keys()):
+        if key.endswith((".rows", ".requests")):
+            continue
+        a, b = old_metrics[key], new_metrics[key]
+        change = f"{100 * (b - a) / a:+.1f}%" if a else ""
+        print(f"{key:<45} {a:>12.2f} {b:>12.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline and API benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000],
+                        help="catalog sizes, e.g. 10000 100000 1000000")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--ingest-rows", type=int, default=1000,
+                        help="catalog rows sent through ingestion (each costs several mock requests)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="mock source latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.01, help="share of mock requests answered with 503")
+    parser.add_argument("--encoder", default="torch", help="embedding and query encoder backend")
+    parser.add_argument("--model", help="sentence-transformers model for the embedding build (default: its MODEL_NAME)")
+    parser.add_argument("--workers", type=int, default=None, help="embedding build worker processes")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per endpoint")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, help="keep the generated files here instead of a temporary directory")
+    parser.add_argument("--out", type=Path, help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"),
+                        help="print the change between two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = {
+        **git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k != "compare"},
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        base = args.workdir or Path(tmp)
+        for size in args.sizes:
+            print(f"=== {size} rows ===", flush=True)
+            report["results"][str(size)] = run_size(size, base / str(size), args)
+
+    out = args.out or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'unknown'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
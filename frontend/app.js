@@ -1,4 +1,6 @@
 const API_BASE_URL = '';
+// Only the columns the book cards render are requested from the API
+const CARD_FIELDS = 'isbn,title,author,year,poster_url,book_url,description';
 
 let currentMode = 'recommend'; // 'recommend' or 'search'
 
@@ -38,7 +40,7 @@ async function performSearch() {
         // Note: /recommend uses ?query=, /search uses ?q=
         const paramName = currentMode === 'recommend' ? 'query' : 'q';
 
-        const response = await fetch(`${API_BASE_URL}${endpoint}?${paramName}=${encodeURIComponent(query)}`);
+        const response = await fetch(`${API_BASE_URL}${endpoint}?${paramName}=${encodeURIComponent(query)}&fields=${CARD_FIELDS}`);
 
         if (!response.ok) {
             throw new Error('API Request failed');
@@ -152,7 +154,7 @@ async function fetchRandomBooks() {
     const section = document.getElementById('random-books-section');
 
     try {
-        const response = await fetch(`${API_BASE_URL}/random-books`);
+        const response = await fetch(`${API_BASE_URL}/random-books?fields=${CARD_FIELDS}`);
         if (!response.ok) throw new Error('Failed to fetch random books');
 
         const books = await response.json();
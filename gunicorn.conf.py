@@ -0,0 +1,25 @@
+"""Gunicorn settings for multi-worker serving (used by start.sh when WEB_CONCURRENCY > 1).
+
+The app is imported once in the master with PRELOAD_RECOMMENDER=1, so the
+SentenceTransformer weights are loaded before the workers are forked and
+their pages are shared copy-on-write. The embedding vectors are a read-only
+mmap of recommender/index/vectors.npy, which every worker maps from the same
+page cache. Each worker therefore only adds its own Python heap.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+os.environ.setdefault("PRELOAD_RECOMMENDER", "1")
+# Split the cores between workers so torch thread pools do not oversubscribe them
+os.environ.setdefault("RECOMMENDER_THREADS", str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def post_fork(server, worker):
+    from recommender.recommender import configure_threads
+    configure_threads()
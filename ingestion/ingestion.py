@@ -1,3 +1,6 @@
+import os
+import sys
+from pathlib import Path
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
@@ -5,11 +8,21 @@ import time
 import re
 from urllib.parse import quote_plus
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from monitoring.run_report import request_hook, stage
+
 INPUT_CSV = "../data/rae/RC_books.csv"
 FINAL_OUTPUT = "../data/processed/dau_with_description.csv"
 
 MISSING_VALUES = ["Not Found", "ISBN Not Matched", "Description Not Available"]
 
+# Base URLs of the description sources. Override them to point ingestion at
+# local stand-ins, e.g. benchmarks/mock_services.py.
+OPENLIBRARY_URL = os.getenv("OPENLIBRARY_URL", "https://openlibrary.org")
+GOOGLE_BOOKS_URL = os.getenv("GOOGLE_BOOKS_URL", "https://books.google.com")
+GOOGLE_BOOKS_API_URL = os.getenv("GOOGLE_BOOKS_API_URL", "https://www.googleapis.com")
+BOOKSWAGON_URL = os.getenv("BOOKSWAGON_URL", "https://www.bookswagon.com")
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; Sahil-BookBot/1.0)"
 }
@@ -53,7 +66,8 @@ def load_library_data():
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-def make_session(max_workers=50):
+def make_session(max_workers=50, source=None):
+    """Pooled session with retries; responses are counted against `source` in the run report."""
     session = requests.Session()
 
     retry = Retry(
@@ -73,6 +87,8 @@ def make_session(max_workers=50):
 
     session.mount("http://", adapter)
     session.mount("https://", adapter)
+    if source:
+        session.hooks["response"].append(request_hook(source))
     return session
 
 
@@ -88,7 +104,7 @@ def fetch_openlibrary_json_descriptions(df, max_workers=20, delay=0.05):
     df["description"] = "ISBN Not Matched"
 
     lock = threading.Lock()
-    session = make_session(max_workers=max_workers)
+    session = make_session(max_workers=max_workers, source="openlibrary")
 
     def fetch_description(row_index, isbn):
         desc = "ISBN Not Matched"
@@ -100,7 +116,7 @@ def fetch_openlibrary_json_descriptions(df, max_workers=20, delay=0.05):
             return
 
         try:
-            url = f"https://openlibrary.org/isbn/{isbn_clean}.json"
+            url = f"{OPENLIBRARY_URL}/isbn/{isbn_clean}.json"
             r = session.get(url, headers=HEADERS, timeout=10)
 
             if r.status_code != 200:
@@ -126,7 +142,7 @@ def fetch_openlibrary_json_descriptions(df, max_workers=20, delay=0.05):
                 if (not desc) and ("works" in data) and len(data["works"]) > 0:
                     work_key = data["works"][0].get("key")
                     if work_key:
-                        work_url = f"https://openlibrary.org{work_key}.json"
+                        work_url = f"{OPENLIBRARY_URL}{work_key}.json"
                         w = session.get(work_url, headers=HEADERS, timeout=10)
                         if w.status_code == 200:
                             wdata = w.json()
@@ -162,7 +178,7 @@ def fetch_google_html_descriptions(df, max_workers=20, delay=0.05):
     df = df.copy()
     lock = threading.Lock()
 
-    session = make_session(max_workers=max_workers)
+    session = make_session(max_workers=max_workers, source="google_html")
 
     def fetch_description(row_index, isbn):
         desc = df.at[row_index, "description"]
@@ -173,7 +189,7 @@ def fetch_google_html_descriptions(df, max_workers=20, delay=0.05):
 
         if isbn_clean:
             try:
-                url = f"https://books.google.com/books?vid=ISBN{isbn_clean}"
+                url = f"{GOOGLE_BOOKS_URL}/books?vid=ISBN{isbn_clean}"
                 r = session.get(url, headers=HEADERS, timeout=10)
                 soup = BeautifulSoup(r.text, "html.parser")
 
@@ -205,7 +221,7 @@ def fetch_bookswagon_descriptions(df, max_workers=10, delay=0.1):
     df = df.copy()
     lock = threading.Lock()
 
-    session = make_session(max_workers=max_workers)
+    session = make_session(max_workers=max_workers, source="bookswagon")
 
     def fetch_description(row_index, isbn):
         desc = df.at[row_index, "description"]
@@ -220,7 +236,7 @@ def fetch_bookswagon_descriptions(df, max_workers=10, delay=0.1):
         # Bookswagon prefers ISBN13 in URL
         # If ISBN is 10-digit, try to still use it (some works, some not)
         try:
-            url = f"https://www.bookswagon.com/book/c/{isbn_clean}"
+            url = f"{BOOKSWAGON_URL}/book/c/{isbn_clean}"
             r = session.get(url, headers=HEADERS, timeout=10)
 
             soup = BeautifulSoup(r.text, "html.parser")
@@ -261,7 +277,7 @@ def fetch_google_api_fallback(df, max_workers=20, delay=0.05):
     df["clean_author"] = df["Author_Editor"].apply(clean_text)
 
     lock = threading.Lock()
-    session = make_session(max_workers=max_workers)
+    session = make_session(max_workers=max_workers, source="google_api")
 
     def fetch_description(row_index, clean_title, clean_author):
         desc = df.at[row_index, "description"]
@@ -276,7 +292,7 @@ def fetch_google_api_fallback(df, max_workers=20, delay=0.05):
 
         for q in queries:
             try:
-                url = f"https://www.googleapis.com/books/v1/volumes?q={quote_plus(q)}&maxResults=1"
+                url = f"{GOOGLE_BOOKS_API_URL}/books/v1/volumes?q={quote_plus(q)}&maxResults=1"
                 res = session.get(url, timeout=10).json()
 
                 items = res.get("items")
@@ -341,27 +357,46 @@ def copy_isbn(df1, df4):
     return df_desc
 
 
+def missing_count(df):
+    return int(df["description"].isin(MISSING_VALUES).sum())
+
+
 def run_pipeline():
     print("Loading base library data...")
-    df1 = load_library_data()
+    with stage("load_library_data") as s:
+        df1 = load_library_data()
+        s.rows_out = len(df1)
 
+    # Each fetcher stage takes the rows still missing a description and
+    # reports how many of them it found one for
     print("Fetching OpenLibrary JSON descriptions...")
-    df2 = fetch_openlibrary_json_descriptions(df1)
+    with stage("openlibrary", rows_in=len(df1)) as s:
+        df2 = fetch_openlibrary_json_descriptions(df1)
+        s.rows_out = s.rows_in - missing_count(df2)
 
     print("Fetching Google Books HTML descriptions...")
-    df3 = fetch_google_html_descriptions(df2)
+    with stage("google_html", rows_in=missing_count(df2)) as s:
+        df3 = fetch_google_html_descriptions(df2)
+        s.rows_out = s.rows_in - missing_count(df3)
 
     print("Fetching Bookswagon fallback descriptions...")
-    df4 = fetch_bookswagon_descriptions(df3)
+    with stage("bookswagon", rows_in=missing_count(df3)) as s:
+        df4 = fetch_bookswagon_descriptions(df3)
+        s.rows_out = s.rows_in - missing_count(df4)
 
     print("Fetching Google Books API fallback descriptions...")
-    df5 = fetch_google_api_fallback(df4)
+    with stage("google_api", rows_in=missing_count(df4)) as s:
+        df5 = fetch_google_api_fallback(df4)
+        s.rows_out = s.rows_in - missing_count(df5)
 
     print("Copy ISBN...")
-    df6 = copy_isbn(df1, df5)
+    with stage("copy_isbn", rows_in=len(df5)) as s:
+        df6 = copy_isbn(df1, df5)
+        s.rows_out = len(df6)
 
     print("Saving FINAL output...")
-    df6.to_csv(FINAL_OUTPUT, index=False)
+    with stage("save", rows_in=len(df6)):
+        df6.to_csv(FINAL_OUTPUT, index=False)
 
     print(f"\n✅ DONE Final file created: {FINAL_OUTPUT}")
 
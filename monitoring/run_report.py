@@ -0,0 +1,283 @@
+"""Per-stage run report for the data pipeline.
+
+Pipeline code marks its stages with `stage()`:
+
+    with stage("openlibrary", rows_in=len(df)) as s:
+        df = fetch_openlibrary_json_descriptions(df)
+        s.rows_out = described(df)
+
+While a RunReport is active (pipeline.py activates one), each stage records
+wall time, CPU time (including reaped child processes such as the embedding
+pool), peak RSS, rows in/out and the HTTP requests its sessions made, per
+source. Stages nest: "ingestion/openlibrary" is a child of "ingestion", and
+a parent's peak RSS and network counts include its children's. Outside a
+report `stage()` only yields a throwaway record, so the instrumented
+functions cost nothing when called directly.
+
+Stages named in `profile` are sampled by a small in-process profiler.
+Its output is folded stacks ("frame;frame;frame count" lines), which
+flamegraph.pl, speedscope and inferno read directly.
+
+Everything here is standard library, so importing it does not slow
+pipeline.py down.
+"""
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Seconds between profiler samples
+PROFILE_INTERVAL = 0.005
+
+_active = None
+
+
+def _status_kb(key: str):
+    """A `kB` field of /proc/self/status (e.g. VmHWM), or None where there is no procfs."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS (VmHWM) so the next reading covers only what follows."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb():
+    peak = _status_kb("VmHWM")
+    if peak is None and resource is not None:
+        # Lifetime peak: an upper bound when the peak cannot be reset
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak
+
+
+def _cpu_seconds() -> float:
+    if resource is None:
+        return time.process_time()
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class Stage:
+    """Measurements of one stage; the caller sets rows_in / rows_out."""
+
+    def __init__(self, name: str, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_kb = None
+        self.network = {}
+        self.error = None
+        self.profile = None
+
+    def to_dict(self) -> dict:
+        out = {
+            "name": self.name,
+            "wall_seconds": round(self.wall_seconds, 3) if self.wall_seconds is not None else None,
+            "cpu_seconds": round(self.cpu_seconds, 3) if self.cpu_seconds is not None else None,
+            "peak_rss_mb": round(self.peak_rss_kb / 1024, 1) if self.peak_rss_kb else None,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+        }
+        if self.network:
+            out["network"] = self.network
+        if self.error:
+            out["error"] = self.error
+        if self.profile:
+            out["profile"] = self.profile
+        return out
+
+
+class SamplingProfiler:
+    """Samples every other thread's Python stack from a background thread and counts folded stacks."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="run-report-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names.setdefault(thread.ident, thread.name)
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                # Thread name at the root groups pool workers together in the flamegraph
+                thread_name = names.get(ident, "thread").split("_")[0]
+                key = ";".join([thread_name] + frames[::-1])
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def write_folded(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class RunReport:
+    """Collects Stage records for one pipeline run and writes them as JSON."""
+
+    def __init__(self, profile=(), profile_dir=None):
+        self.profile = set(profile)
+        self.profile_dir = Path(profile_dir) if profile_dir else Path("profiles")
+        self.stages = []
+        self.network = {}
+        self._open = []
+        self._lock = threading.Lock()
+        self._peak_resettable = None
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def active(self):
+        """Make this the report stage() records into."""
+        global _active
+        previous, _active = _active, self
+        try:
+            yield self
+        finally:
+            _active = previous
+
+    def _fold_peak(self) -> None:
+        """Credit the peak RSS since the last reset to every open stage."""
+        peak = _peak_rss_kb()
+        if peak is not None:
+            for record in self._open:
+                record.peak_rss_kb = max(record.peak_rss_kb or 0, peak)
+
+    @contextmanager
+    def stage(self, name: str, rows_in=None):
+        full_name = f"{self._open[-1].name}/{name}" if self._open else name
+        record = Stage(full_name, rows_in)
+        self._fold_peak()
+        with self._lock:
+            self._open.append(record)
+            self.stages.append(record)
+        self._peak_resettable = _reset_peak_rss()
+        profiler = None
+        if self.profile & {name, full_name}:
+            profiler = SamplingProfiler()
+            profiler.start()
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.wall_seconds = time.perf_counter() - wall
+            record.cpu_seconds = _cpu_seconds() - cpu
+            if profiler:
+                profiler.stop()
+                path = self.profile_dir / f"{full_name.replace('/', '.')}.folded"
+                profiler.write_folded(path)
+                record.profile = str(path)
+            self._fold_peak()
+            with self._lock:
+                self._open.remove(record)
+
+    def record_request(self, source: str, nbytes: int, status: int, retries: int = 0) -> None:
+        """Count one HTTP response against the open stages and the run's per-source totals."""
+        with self._lock:
+            for counts in [s.network for s in self._open] + [self.network]:
+                entry = counts.get(source)
+                if entry is None:
+                    entry = counts[source] = {"requests": 0, "bytes": 0, "errors": 0, "retries": 0}
+                entry["requests"] += 1
+                entry["bytes"] += nbytes
+                entry["errors"] += status >= 400
+                entry["retries"] += retries
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - self._start, 3),
+            "argv": sys.argv,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            # False when peak RSS is the process lifetime peak rather than per stage
+            "per_stage_peak_rss": bool(self._peak_resettable),
+            "stages": [s.to_dict() for s in self.stages],
+            "network": self.network,
+        }
+
+    def write(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+        return path
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<36} {'wall s':>8} {'cpu s':>8} {'peak MB':>8} {'rows in':>9} {'rows out':>9} "
+                 f"{'requests':>9} {'MB in':>7}"]
+        for s in self.stages:
+            d = s.to_dict()
+            requests = sum(n["requests"] for n in s.network.values())
+            received = sum(n["bytes"] for n in s.network.values()) / 1e6
+            lines.append(
+                f"{d['name']:<36} {d['wall_seconds'] or 0:>8.2f} {d['cpu_seconds'] or 0:>8.2f} "
+                f"{d['peak_rss_mb'] or 0:>8.0f} {'' if s.rows_in is None else s.rows_in:>9} "
+                f"{'' if s.rows_out is None else s.rows_out:>9} {requests or '':>9} "
+                f"{f'{received:.1f}' if requests else '':>7}"
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def stage(name: str, rows_in=None):
+    """Record the wrapped block as a stage of the active report; a no-op without one."""
+    if _active is None:
+        yield Stage(name, rows_in)
+        return
+    with _active.stage(name, rows_in) as record:
+        yield record
+
+
+def request_hook(source: str):
+    """A requests response hook counting each response of a session against `source`."""
+    def hook(response, *args, **kwargs):
+        if _active is not None:
+            retries = getattr(getattr(response.raw, "retries", None), "history", ())
+            _active.record_request(source, len(response.content), response.status_code, len(retries))
+    return hook
@@ -1,13 +1,60 @@
+"""Command line entry point for the data pipeline.
+
+Each stage imports its own dependencies when it runs, so `--db` or
+`--transformation` never pay for the API/recommender stack (FastAPI,
+sentence-transformers, torch) they do not use.
+
+Every run records a per-stage report (wall/CPU time, peak RSS, rows and
+source requests; see monitoring/run_report.py), prints a summary and writes
+it as JSON to --report. `--profile STAGE` also samples the named stages into
+flamegraph-compatible folded stacks.
+"""
 import argparse
-from urllib import parse
-from ingestion.ingestion import run_pipeline
-from transformation.transformation import transformation
-from storage.db import main_db
-from API.main import app
-import uvicorn
+from pathlib import Path
+
+LOGS_DIR = Path(__file__).resolve().parent / "logs"
+
+
+def ingestion():
+    from ingestion.ingestion import run_pipeline
+    run_pipeline()
+
+
+def transformation():
+    from transformation.transformation import transformation as run_transformation
+    run_transformation()
+
+
+def db():
+    from storage.db import main_db
+    main_db()
+
+
+def embeddings():
+    from recommender.build_embeddings import create_embeddings
+    create_embeddings()
+
+
+STAGES = {"ingestion": ingestion, "transformation": transformation, "db": db, "embeddings": embeddings}
+
+
+def run_stages(names, report_path, profile=(), profile_dir=None):
+    """Run the named stages in order under a RunReport, then print and write it (even after a failure)."""
+    from monitoring.run_report import RunReport, stage
+
+    report = RunReport(profile=profile, profile_dir=profile_dir)
+    try:
+        with report.active():
+            for name in names:
+                with stage(name):
+                    STAGES[name]()
+    finally:
+        print(report.summary())
+        print(f"Run report written to {report.write(report_path)}")
 
 
 def api():
+    import uvicorn
     uvicorn.run(
         "API.main:app",
         # host="127.0.0.1",
@@ -21,31 +68,24 @@ def main():
     parser.add_argument("--ingestion", action="store_true")
     parser.add_argument("--transformation", action="store_true")
     parser.add_argument("--db", action="store_true")
+    parser.add_argument("--embeddings", action="store_true")
     parser.add_argument("--api", action="store_true")
     parser.add_argument("--all", action="store_true")
+    parser.add_argument("--report", type=Path, default=LOGS_DIR / "pipeline_report.json",
+                        help="where to write the JSON run report")
+    parser.add_argument("--profile", nargs="+", default=[], metavar="STAGE",
+                        help="sample these stages (e.g. openlibrary, ingestion/copy_isbn, insert_data) into folded stacks")
+    parser.add_argument("--profile-dir", type=Path, default=LOGS_DIR / "profiles")
 
     args = parser.parse_args()
 
-    if args.all:
-        run_pipeline()
-        transformation()
-        main_db()
-        app()
-        api()
-        return
-
-    if args.ingestion:
-        run_pipeline()
-
-    if args.transformation:
-        transformation()
+    names = [name for name in STAGES if args.all or getattr(args, name)]
+    if names:
+        run_stages(names, args.report, args.profile, args.profile_dir)
 
-    if args.db:
-        main_db()
-    
-    if args.api:
+    if args.all or args.api:
         api()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
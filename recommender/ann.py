@@ -0,0 +1,183 @@
+"""Pluggable nearest-neighbour backends for the embedding store.
+
+Every backend exposes `search(query, k) -> (row indices, scores)` over the
+store's rows. ExactIndex scans all vectors and is always available. The
+approximate backends trade a little recall for sub-linear query time on
+large catalogs:
+
+    hnsw    hnswlib graph index; recall/latency knob: ef
+    ivfpq   faiss IVF-PQ index; recall/latency knob: nprobe. Candidates are
+            re-ranked with the exact vectors, so scores stay exact.
+
+Indexes are built by build_embeddings.py --ann and saved next to the vectors.
+The backend libraries are optional; if one is missing or the index file is
+absent, load_index() falls back to exact search.
+"""
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from recommender.scoring import INT8_RERANK_FACTOR, search, top_k
+
+ANN_BACKENDS = ("hnsw", "ivfpq")
+
+# Defaults for the query-time knobs (overridable per BookRecommender)
+DEFAULT_EF = 64
+DEFAULT_NPROBE = 16
+
+
+class ExactIndex:
+    """Brute-force scan of the (optionally int8) vectors."""
+
+    name = "exact"
+
+    def __init__(self, vectors, int8_vectors=None):
+        self.vectors = vectors
+        self.int8_vectors = int8_vectors
+
+    def search(self, query, k):
+        return search(self.vectors, query, k, self.int8_vectors)
+
+
+class HNSWIndex:
+    name = "hnsw"
+    file_name = "ann_hnsw.bin"
+
+    def __init__(self, index, ef):
+        self.index = index
+        self.set_ef(ef)
+
+    def set_ef(self, ef):
+        self.ef = ef
+        self.index.set_ef(ef)
+
+    @classmethod
+    def build(cls, vectors, store_dir: Path, M: int = 16, ef_construction: int = 200) -> dict:
+        import hnswlib
+
+        n, dim = vectors.shape
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.init_index(max_elements=max(n, 1), M=M, ef_construction=ef_construction)
+        for start in range(0, n, 100_000):
+            block = np.asarray(vectors[start:start + 100_000], dtype=np.float32)
+            index.add_items(block, np.arange(start, start + len(block)))
+        index.save_index(str(Path(store_dir) / cls.file_name))
+        return {"M": M, "ef_construction": ef_construction}
+
+    @classmethod
+    def load(cls, store_dir: Path, manifest: dict, ef: int = DEFAULT_EF, **_):
+        import hnswlib
+
+        index = hnswlib.Index(space="ip", dim=manifest["dim"])
+        index.load_index(str(Path(store_dir) / cls.file_name), max_elements=manifest["count"])
+        return cls(index, ef)
+
+    def search(self, query, k):
+        k = min(k, self.index.get_current_count())
+        labels, distances = self.index.knn_query(np.asarray(query, dtype=np.float32).reshape(1, -1), k=k)
+        # The "ip" space returns 1 - dot product
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+
+class IVFPQIndex:
+    name = "ivfpq"
+    file_name = "ann_ivfpq.faiss"
+
+    def __init__(self, index, vectors, nprobe):
+        self.index = index
+        self.vectors = vectors
+        self.set_nprobe(nprobe)
+
+    def set_nprobe(self, nprobe):
+        self.nprobe = nprobe
+        self.index.nprobe = nprobe
+
+    @classmethod
+    def build(cls, vectors, store_dir: Path, nlist: int = None, m: int = None, train_size: int = 200_000) -> dict:
+        import faiss
+
+        n, dim = vectors.shape
+        nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 39))
+        # Largest sub-quantizer count <= dim / 8 that divides dim (48 for 384-d vectors)
+        m = m or next(c for c in range(max(1, dim // 8), 0, -1) if dim % c == 0)
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, 8, faiss.METRIC_INNER_PRODUCT)
+
+        sample = np.random.default_rng(0).choice(n, size=min(n, train_size), replace=False)
+        index.train(np.asarray(vectors[np.sort(sample)], dtype=np.float32))
+        for start in range(0, n, 100_000):
+            index.add(np.asarray(vectors[start:start + 100_000], dtype=np.float32))
+        faiss.write_index(index, str(Path(store_dir) / cls.file_name))
+        return {"nlist": nlist, "m": m}
+
+    @classmethod
+    def load(cls, store_dir: Path, manifest: dict, vectors=None, nprobe: int = DEFAULT_NPROBE, **_):
+        import faiss
+
+        index = faiss.read_index(str(Path(store_dir) / cls.file_name))
+        return cls(index, vectors, nprobe)
+
+    def search(self, query, k):
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        _, labels = self.index.search(query, k * INT8_RERANK_FACTOR)
+        candidates = np.sort(labels[0][labels[0] >= 0])
+        # PQ scores are approximate; re-rank the candidates with the stored vectors
+        scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query[0]
+        order = top_k(scores, k)
+        return candidates[order], scores[order]
+
+
+BACKENDS = {cls.name: cls for cls in (HNSWIndex, IVFPQIndex)}
+
+# Cap on candidates fetched from an ANN index for a filtered query
+MAX_FILTERED_FETCH = 2000
+
+
+def filtered_search(index, vectors, int8_vectors, query, k, row_filter=None):
+    """Top-k rows of `index` allowed by `row_filter` (a filters.RowFilter); returns (indices, scores).
+
+    Exact search applies the filter inside the scan. An ANN index cannot, so
+    for broad filters it is asked for enough extra candidates that k of them
+    should match. Selective filters, or an over-fetch that comes back short,
+    use the exact filtered scan, which then only scores the matching rows.
+    """
+    if row_filter is None:
+        return index.search(query, k)
+    if index.name != "exact" and row_filter.rows is None:
+        fetch = min(int(np.ceil(2 * k / max(row_filter.fraction, 1e-9))), MAX_FILTERED_FETCH)
+        rows, scores = index.search(query, fetch)
+        keep = row_filter.mask[rows]
+        if keep.sum() >= min(k, row_filter.count):
+            return rows[keep][:k], scores[keep][:k]
+    return search(vectors, query, k, int8_vectors, row_filter)
+
+
+def build_ann(backend: str, vectors, store_dir: Path, **params) -> dict:
+    """Build and save an ANN index for normalized `vectors`; returns the manifest entry."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend {backend}; choose from {ANN_BACKENDS}")
+    logging.info(f"Building {backend} index over {vectors.shape[0]} vectors...")
+    built = BACKENDS[backend].build(vectors, store_dir, **params)
+    return {"backend": backend, "file": BACKENDS[backend].file_name, "params": built}
+
+
+def load_index(store_dir: Path, manifest: dict, vectors, int8_vectors=None,
+               backend: str = "auto", ef: int = DEFAULT_EF, nprobe: int = DEFAULT_NPROBE):
+    """Return the index to query: the store's ANN index or ExactIndex as fallback.
+
+    backend="auto" uses whatever ANN index the store was built with,
+    "exact" forces a full scan and a backend name requires that index.
+    """
+    built = (manifest.get("ann") or {}).get("backend")
+    wanted = built if backend == "auto" else backend
+    if wanted in (None, "exact"):
+        return ExactIndex(vectors, int8_vectors)
+    if wanted != built:
+        logging.warning(f"Store has no {wanted} index (built: {built}); using exact search.")
+        return ExactIndex(vectors, int8_vectors)
+    try:
+        return BACKENDS[wanted].load(store_dir, manifest, vectors=vectors, ef=ef, nprobe=nprobe)
+    except (ImportError, OSError, RuntimeError) as e:
+        logging.warning(f"Could not load {wanted} index ({e}); using exact search.")
+        return ExactIndex(vectors, int8_vectors)
@@ -0,0 +1,75 @@
+"""Substring index over book authors for the recommender's author boost.
+
+Authors are lowercased once and de-duplicated (many books share an author).
+Each distinct name is indexed by its character trigrams. A query's
+candidates are the names that contain its rarest trigrams, and they are
+confirmed with a plain `in` test. Results are therefore exactly those of
+`query in author.lower()`, without scanning every book per request.
+"""
+import numpy as np
+
+NGRAM = 3
+
+
+def _grams(text: str) -> set:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class AuthorIndex:
+    def __init__(self, authors):
+        """Index `authors`, one (possibly empty) author string per store row."""
+        name_ids = {}
+        row_names = np.empty(len(authors), dtype=np.int32)
+        for row, author in enumerate(authors):
+            row_names[row] = name_ids.setdefault((author or "").lower(), len(name_ids))
+        self.names = list(name_ids)
+
+        # Rows of each distinct name, CSR style: rows[offsets[i]:offsets[i + 1]]
+        self._rows = np.argsort(row_names, kind="stable").astype(np.int32)
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(row_names, minlength=len(self.names)))))
+        # Name ids are assigned in row order, so first rows increase with the id
+        self._first_rows = self._rows[self._offsets[:-1]]
+
+        postings = {}
+        for name_id, name in enumerate(self.names):
+            for gram in _grams(name):
+                postings.setdefault(gram, []).append(name_id)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def _candidates(self, query: str):
+        """Name ids that may contain `query`, from the two rarest trigram postings."""
+        grams = _grams(query)
+        if not grams:
+            return range(len(self.names))
+        lists = sorted((self._postings.get(g) for g in grams), key=lambda p: 0 if p is None else len(p))
+        if lists[0] is None:
+            return ()
+        if len(lists) == 1:
+            return lists[0]
+        return np.intersect1d(lists[0], lists[1], assume_unique=True)
+
+    def match(self, query: str, limit: int = None) -> np.ndarray:
+        """Rows whose author contains `query` (case-insensitive), in ascending row order.
+
+        With `limit`, only the first `limit` rows are returned and candidate
+        names whose first row comes after them are never checked.
+        """
+        query = query.lower()
+        candidates = self._candidates(query)
+        if limit is None:
+            name_ids = [i for i in candidates if query in self.names[i]]
+            if not name_ids:
+                return np.empty(0, dtype=np.int32)
+            rows = np.concatenate([self._rows[self._offsets[i]:self._offsets[i + 1]] for i in name_ids])
+            rows.sort()
+            return rows
+
+        found = []
+        for i in candidates:  # ascending ids, i.e. ascending first rows
+            if len(found) >= limit and self._first_rows[i] > found[limit - 1]:
+                break
+            if query in self.names[i]:
+                found.extend(self._rows[self._offsets[i]:self._offsets[i + 1]].tolist())
+                found.sort()
+                del found[limit:]
+        return np.asarray(found, dtype=np.int32)
@@ -1,69 +1,316 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
 import sqlite3
-import pandas as pd
+import sys
+import time
+import numpy as np
 import pickle
 import logging
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Paths
 ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from recommender.ann import ANN_BACKENDS
+from recommender.encoders import ENCODER_BACKENDS, load_encoder
+from recommender.store import STORE_DIR, SUPPORTED_DTYPES, open_hashes, open_store, resolve_store, write_store
+from monitoring.run_report import stage
+
 DB_PATH = ROOT / "storage" / "library.db"
-EMBEDDINGS_PATH = ROOT / "recommender" / "embeddings.pkl"
-
-def load_data():
-    """Load books from SQLite database."""
-    if not DB_PATH.exists():
-        raise FileNotFoundError(f"Database not found at {DB_PATH}")
-    
-    logging.info("Connecting to database...")
-    conn = sqlite3.connect(DB_PATH)
-    query = """
-        SELECT isbn, title, author, description, year, poster_url, book_url
-        FROM books 
-        WHERE description IS NOT NULL AND description != ''
+# Pre-store artefact, only read by --from-pickle
+LEGACY_EMBEDDINGS_PATH = ROOT / "recommender" / "embeddings.pkl"
+MODEL_NAME = 'all-MiniLM-L6-v2'
+# Encoded vectors and progress of an unfinished build, removed once the store is written
+BUILD_DIR = STORE_DIR.with_name(STORE_DIR.name + ".build")
+PROGRESS_FILE = "progress.json"
+BUILD_VECTORS_FILE = "vectors.npy"
+# Rows fetched from SQLite, encoded and checkpointed together
+CHUNK_ROWS = 4096
+ENCODE_BATCH_SIZE = 64
+# Below this many texts the pool start-up costs more than it saves
+MIN_POOL_TEXTS = 2000
+
+# Rows are keyed by ISBN in the store, so books without one are skipped.
+# ORDER BY rowid keeps both passes over the table in the same order.
+BOOKS_QUERY = """
+    SELECT isbn, title, description
+    FROM books
+    WHERE description IS NOT NULL AND description != '' AND isbn IS NOT NULL
+    ORDER BY rowid
+"""
+
+def iter_books(db_path=None):
+    """Yield (isbn, text_to_embed) from SQLite, fetching CHUNK_ROWS at a time."""
+    db_path = Path(db_path or DB_PATH)
+    if not db_path.exists():
+        raise FileNotFoundError(f"Database not found at {db_path}")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(BOOKS_QUERY)
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                break
+            for isbn, title, description in rows:
+                # We combine title and description for better context
+                yield str(isbn), f"{title or ''}: {description}"
+    finally:
+        conn.close()
+
+def content_hash(text):
+    """16-byte digest of the exact text a book's vector is encoded from."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+def load_previous(encoder="torch"):
+    """Return (manifest, vectors, {isbn: (hash, row)}) for the current store.
+
+    Returns (None, None, {}) when there is no store to reuse: none built yet,
+    built without content hashes, or built with another model or encoder
+    backend. Stores from before the manifest recorded the encoder were
+    built with torch.
     """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    logging.info(f"Loaded {len(df)} records from database.")
-    return df
-
-def create_embeddings():
-    """Generate and save embeddings."""
-    df = load_data()
-    
-    # Prepare text for embedding
-    # We combine title and description for better context
-    logging.info("Preprocessing text...")
-    df['text_to_embed'] = df['title'].fillna('') + ": " + df['description'].fillna('')
-    texts = df['text_to_embed'].tolist()
-    
-    # Initialize model
-    model_name = 'all-MiniLM-L6-v2'
-    logging.info(f"Loading SentenceTransformer model: {model_name}...")
-    model = SentenceTransformer(model_name)
-    
-    # Generate embeddings
-    logging.info("Generating embeddings (this may take a while)...")
-    embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
-    
-    # Save to file
-    data_to_save = {
-        'ids': df['isbn'].tolist(),
-        'metadatas': df[['isbn', 'title', 'author', 'year', 'poster_url', 'book_url', 'description']].to_dict('records'),
-        'embeddings': embeddings,
-        'model_name': model_name
-    }
-    
-    EMBEDDINGS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(EMBEDDINGS_PATH, 'wb') as f:
-        pickle.dump(data_to_save, f)
-        
-    logging.info(f"Embeddings saved to {EMBEDDINGS_PATH}")
-    logging.info(f"Shape: {embeddings.shape}")
+    store_dir = resolve_store(STORE_DIR)
+    try:
+        manifest, vectors, ids = open_store(store_dir)
+    except (FileNotFoundError, ValueError):
+        return None, None, {}
+    hashes = open_hashes(store_dir)
+    if (hashes is None or manifest.get("model_name") != MODEL_NAME
+            or manifest.get("encoder", "torch") != encoder):
+        logging.info("Existing store has no content hashes or uses another model or encoder; re-encoding everything.")
+        return None, None, {}
+    rows = {isbn: (h, row) for row, (isbn, h) in enumerate(zip(ids.tolist(), hashes))}
+    return manifest, vectors, rows
+
+def same_options(manifest, dtype, int8, ann):
+    return (manifest["dtype"] == dtype
+            and bool(manifest.get("int8_scale")) == int8
+            and (manifest.get("ann") or {}).get("backend") == ann)
+
+def plan_fingerprint(isbns, hashes, todo, encoder="torch"):
+    """Identify a build's work list and encoder, so a checkpoint is only resumed for the same one."""
+    digest = hashlib.blake2b(f"{MODEL_NAME}:{encoder}".encode(), digest_size=16)
+    digest.update(str(len(isbns)).encode())
+    for i in todo:
+        digest.update(isbns[i].encode())
+        digest.update(hashes[i])
+    return digest.hexdigest()
+
+def open_build(count, dim, fingerprint):
+    """Return (vectors memmap, chunks already done) for this build, resuming a checkpoint if it matches."""
+    vectors_path = BUILD_DIR / BUILD_VECTORS_FILE
+    try:
+        progress = json.loads((BUILD_DIR / PROGRESS_FILE).read_text())
+        if progress["fingerprint"] == fingerprint and progress["chunk_rows"] == CHUNK_ROWS:
+            vectors = np.lib.format.open_memmap(vectors_path, mode="r+")
+            if vectors.shape == (count, dim):
+                return vectors, progress["chunks_done"]
+        logging.info("Discarding checkpoint from a different build.")
+    except (FileNotFoundError, KeyError, ValueError):
+        pass
+
+    shutil.rmtree(BUILD_DIR, ignore_errors=True)
+    BUILD_DIR.mkdir(parents=True)
+    vectors = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=np.float32, shape=(count, dim))
+    save_progress(fingerprint, 0)
+    return vectors, 0
+
+def save_progress(fingerprint, chunks_done):
+    tmp = BUILD_DIR / (PROGRESS_FILE + ".tmp")
+    tmp.write_text(json.dumps({"fingerprint": fingerprint, "chunk_rows": CHUNK_ROWS, "chunks_done": chunks_done}))
+    os.replace(tmp, BUILD_DIR / PROGRESS_FILE)
+
+def iter_todo_chunks(todo):
+    """Second pass over SQLite: yield (positions, texts) for each CHUNK_ROWS books to encode."""
+    wanted = iter(todo)
+    next_pos = next(wanted, None)
+    positions, texts = [], []
+    for pos, (_, text) in enumerate(iter_books()):
+        if pos != next_pos:
+            continue
+        positions.append(pos)
+        texts.append(text)
+        next_pos = next(wanted, None)
+        if len(positions) == CHUNK_ROWS:
+            yield positions, texts
+            positions, texts = [], []
+        if next_pos is None:
+            break
+    if positions:
+        yield positions, texts
+
+class Encoder:
+    """Encoder from load_encoder(); torch builds are spread over a process pool when there is enough to encode.
+
+    ONNX Runtime already uses every core from one process, so it gets no pool.
+    """
+
+    def __init__(self, backend, workers, total):
+        logging.info(f"Loading {backend} encoder for {MODEL_NAME}...")
+        self.encoder = load_encoder(backend, MODEL_NAME)
+        self.dim = self.encoder.dim
+        self.pool = None
+        if backend == "torch" and workers > 1 and total >= MIN_POOL_TEXTS:
+            model = self.encoder.model
+            # One torch thread pool per worker would oversubscribe the cores
+            previous = os.environ.get("OMP_NUM_THREADS")
+            os.environ["OMP_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // workers))
+            try:
+                self.pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+            finally:
+                if previous is None:
+                    os.environ.pop("OMP_NUM_THREADS")
+                else:
+                    os.environ["OMP_NUM_THREADS"] = previous
+            logging.info(f"Encoding with {workers} worker processes.")
+
+    def encode(self, texts):
+        if self.pool is not None:
+            chunk_size = max(ENCODE_BATCH_SIZE, -(-len(texts) // len(self.pool["processes"])))
+            return self.encoder.model.encode_multi_process(
+                texts, self.pool, batch_size=ENCODE_BATCH_SIZE, chunk_size=chunk_size, normalize_embeddings=True
+            )
+        return self.encoder.encode(texts, batch_size=ENCODE_BATCH_SIZE)
+
+    def close(self):
+        if self.pool is not None:
+            self.encoder.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+def encode_todo(todo, vectors, encoder, fingerprint, chunks_done):
+    """Encode the books at `todo` positions into `vectors`, checkpointing after every chunk."""
+    chunks = -(-len(todo) // CHUNK_ROWS)
+    encoded, started = 0, time.perf_counter()
+    for chunk, (positions, texts) in enumerate(iter_todo_chunks(todo)):
+        if chunk < chunks_done:
+            continue
+        # Similar lengths batch together, so less of each batch is padding.
+        # Character length is a cheap stand-in for token length.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result = encoder.encode([texts[i] for i in order])
+        vectors[[positions[i] for i in order]] = result
+        vectors.flush()
+        save_progress(fingerprint, chunk + 1)
+
+        encoded += len(texts)
+        elapsed = time.perf_counter() - started
+        logging.info(f"Chunk {chunk + 1}/{chunks}: {encoded} texts in {elapsed:.1f}s ({encoded / elapsed:.0f} texts/sec)")
+    return encoded, time.perf_counter() - started
+
+def create_embeddings(dtype="float32", int8=False, ann=None, full=False, workers=None, encoder="torch"):
+    """Generate embeddings and write them to the vector store.
+
+    Unless `full` is set, only books whose title/description changed since the
+    last build (or that are new) are encoded; unchanged vectors are copied from
+    the existing store and deleted books are dropped. Encoded vectors are
+    checkpointed under BUILD_DIR, so rerunning an interrupted build resumes it.
+    """
+    # First pass: hash every book without holding the texts
+    logging.info("Hashing books...")
+    isbns, hashes = [], []
+    with stage("hash_books") as s:
+        for isbn, text in iter_books():
+            isbns.append(isbn)
+            hashes.append(content_hash(text))
+        s.rows_out = len(isbns)
+    logging.info(f"Loaded {len(isbns)} records from database.")
+    if not isbns:
+        raise ValueError("No books with a description and ISBN to embed")
+
+    manifest, previous_vectors, previous = (None, None, {}) if full else load_previous(encoder)
+    reuse_at, reuse_from, todo = [], [], []
+    for i, (isbn, h) in enumerate(zip(isbns, hashes)):
+        prev = previous.get(isbn)
+        if prev is not None and prev[0] == h:
+            reuse_at.append(i)
+            reuse_from.append(prev[1])
+        else:
+            todo.append(i)
+    deleted = len(previous.keys() - set(isbns))
+    logging.info(f"{len(reuse_at)} unchanged, {len(todo)} new or changed, {deleted} deleted.")
+
+    if (manifest and not todo and not deleted and list(previous) == isbns
+            and same_options(manifest, dtype, int8, ann)):
+        logging.info(f"Embedding store at {STORE_DIR} is up to date.")
+        return
+
+    if todo:
+        with stage("load_encoder"):
+            model = Encoder(encoder, workers or os.cpu_count() or 1, len(todo))
+        dim = model.dim
+    else:
+        model, dim = None, previous_vectors.shape[1]
+    fingerprint = plan_fingerprint(isbns, hashes, todo, encoder)
+    vectors, chunks_done = open_build(len(isbns), dim, fingerprint)
+    if chunks_done:
+        logging.info(f"Resuming from checkpoint: {min(chunks_done * CHUNK_ROWS, len(todo))} texts already encoded.")
+
+    if model is not None:
+        # Second pass: stream only the books that need encoding
+        logging.info("Generating embeddings (this may take a while)...")
+        with stage("encode", rows_in=len(todo)) as s:
+            try:
+                encoded, elapsed = encode_todo(todo, vectors, model, fingerprint, chunks_done)
+            finally:
+                model.close()
+            s.rows_out = encoded
+        if encoded:
+            logging.info(f"Encoded {encoded} texts in {elapsed:.1f}s ({encoded / elapsed:.0f} texts/sec)")
+    # Copied a chunk at a time so unchanged vectors never sit in RAM all at once
+    for start in range(0, len(reuse_at), CHUNK_ROWS):
+        vectors[reuse_at[start:start + CHUNK_ROWS]] = previous_vectors[reuse_from[start:start + CHUNK_ROWS]]
+
+    # write_store publishes a new version of the store, so a running API keeps its mapping
+    with stage("write_store", rows_in=len(isbns)) as s:
+        manifest = write_store(isbns, vectors, MODEL_NAME, STORE_DIR, dtype=dtype, int8=int8, ann=ann, hashes=hashes,
+                               encoder=encoder)
+        s.rows_out = manifest["count"]
+    del vectors
+    shutil.rmtree(BUILD_DIR, ignore_errors=True)
+    logging.info(f"Embeddings saved to {STORE_DIR}")
+    logging.info(f"Shape: ({manifest['count']}, {manifest['dim']}) {manifest['dtype']}")
+
+def convert_pickle(pickle_path=LEGACY_EMBEDDINGS_PATH, dtype="float32", int8=False, ann=None):
+    """Convert a legacy embeddings.pkl into the vector store without re-encoding."""
+    logging.info(f"Loading legacy embeddings from {pickle_path}...")
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    manifest = write_store(
+        data['ids'], data['embeddings'], data.get('model_name', MODEL_NAME), STORE_DIR, dtype=dtype, int8=int8, ann=ann
+    )
+    logging.info(f"Converted {manifest['count']} vectors to {STORE_DIR}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the book embedding store")
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32",
+                        help="on-disk vector precision (float16 halves size and RSS)")
+    parser.add_argument("--int8", action="store_true",
+                        help="also write an int8 copy of the vectors for RECOMMENDER_INT8=1 scoring")
+    parser.add_argument("--ann", choices=ANN_BACKENDS,
+                        help="also build an approximate nearest-neighbour index (needs hnswlib / faiss-cpu)")
+    parser.add_argument("--full", action="store_true",
+                        help="re-encode every book instead of only new or changed ones")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="encoder processes (default: one per CPU core; 1 encodes in this process)")
+    parser.add_argument("--encoder", choices=ENCODER_BACKENDS, default="torch",
+                        help="onnx / onnx-int8 use the export_onnx.py output on ONNX Runtime instead of torch")
+    parser.add_argument("--from-pickle", nargs="?", const=str(LEGACY_EMBEDDINGS_PATH), metavar="PATH",
+                        help="convert an existing embeddings.pkl instead of re-encoding")
+    args = parser.parse_args()
+
+    if args.from_pickle:
+        convert_pickle(Path(args.from_pickle), dtype=args.dtype, int8=args.int8, ann=args.ann)
+    else:
+        create_embeddings(dtype=args.dtype, int8=args.int8, ann=args.ann, full=args.full, workers=args.workers,
+                          encoder=args.encoder)
 
 if __name__ == "__main__":
-    create_embeddings()
+    main()
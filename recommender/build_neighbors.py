@@ -0,0 +1,49 @@
+import argparse
+import sqlite3
+import sys
+import time
+import logging
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from recommender.ann import load_index
+from recommender.neighbors import DEFAULT_NEIGHBORS, compute_neighbors, write_neighbors
+from recommender.store import STORE_DIR, open_store, resolve_store
+
+DB_PATH = ROOT / "storage" / "library.db"
+
+def build_neighbors(n=DEFAULT_NEIGHBORS, use_ann=False):
+    """Precompute the top-n neighbours of every book in the store into SQLite."""
+    store_dir = resolve_store(STORE_DIR)
+    manifest, vectors, ids = open_store(store_dir)
+    index = None
+    if use_ann:
+        index = load_index(store_dir, manifest, vectors)
+        logging.info(f"Using {index.name} vector search.")
+        if index.name == "exact":
+            index = None
+
+    logging.info(f"Computing {n} neighbours for {manifest['count']} books...")
+    start = time.perf_counter()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        written = write_neighbors(conn, ids.tolist(), compute_neighbors(vectors, n, index), manifest, n)
+    finally:
+        conn.close()
+    logging.info(f"Wrote {written} neighbour rows to {DB_PATH} in {time.perf_counter() - start:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute similar-book lists for /books/{isbn}/similar")
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS,
+                        help="neighbours kept per book; the endpoint falls back to live scoring above this")
+    parser.add_argument("--ann", action="store_true",
+                        help="query the store's ANN index per book instead of exact block scoring (large catalogs)")
+    args = parser.parse_args()
+    build_neighbors(args.neighbors, args.ann)
+
+if __name__ == "__main__":
+    main()
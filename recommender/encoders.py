@@ -0,0 +1,136 @@
+"""Text encoders turning queries and book texts into unit-length vectors.
+
+    torch      SentenceTransformer on PyTorch (default)
+    onnx       the same model exported to ONNX, run on ONNX Runtime
+    onnx-int8  the ONNX export with dynamically quantized int8 weights
+
+The ONNX backends need only onnxruntime and tokenizers, so a serving image
+can skip torch entirely. The export is written by export_onnx.py, which also
+checks that its embeddings match the torch ones (cosine >= PARITY_MIN_COSINE).
+Both BookRecommender (RECOMMENDER_ENCODER) and build_embeddings.py
+(--encoder) load their encoder through load_encoder().
+"""
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+from recommender.scoring import normalize
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_DIR = Path(__file__).resolve().parent / "onnx"
+ONNX_CONFIG_FILE = "encoder.json"
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+
+# Lowest per-text cosine similarity to the torch output an export may have
+PARITY_MIN_COSINE = 0.99
+
+
+class TorchEncoder:
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        # Imported here: sentence_transformers pulls in torch
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        # Renamed get_embedding_dimension in sentence-transformers 6
+        dimension = getattr(self.model, "get_embedding_dimension", None) or self.model.get_sentence_embedding_dimension
+        self.dim = dimension()
+
+    def encode(self, texts, batch_size: int = 32):
+        vectors = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        return normalize(vectors)
+
+
+class OnnxEncoder:
+    """Tokenizer + ONNX transformer + pooling, matching the SentenceTransformer pipeline.
+
+    The ONNX Runtime session is created per process: its thread pool does not
+    survive a fork, so a session made in a preloading gunicorn master is
+    replaced on first use in each worker.
+    """
+
+    def __init__(self, model_dir: Path = ONNX_DIR, backend: str = "onnx", threads: int = None):
+        from tokenizers import Tokenizer
+
+        self.name = backend
+        self.model_dir = Path(model_dir)
+        try:
+            self.config = json.loads((self.model_dir / ONNX_CONFIG_FILE).read_text())
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"No ONNX export at {self.model_dir}. Run recommender/export_onnx.py first."
+            ) from None
+        self.model_path = self.model_dir / ONNX_FILES[backend]
+        if not self.model_path.exists():
+            raise FileNotFoundError(f"{self.model_path} is missing; export with --quantize for onnx-int8.")
+        self.model_name = self.config["model_name"]
+        self.dim = self.config["dim"]
+        self.pooling = self.config["pooling"]
+        self.threads = threads
+
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_token_id"], pad_token=self.config["pad_token"])
+        self._session = None
+        self._pid = None
+        self._get_session()
+
+    def _get_session(self):
+        if self._pid != os.getpid():
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            threads = self.threads or int(os.getenv("RECOMMENDER_THREADS") or 0)
+            # 0 lets ONNX Runtime use one thread per physical core
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            self._session = ort.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+            self._inputs = {i.name for i in self._session.get_inputs()}
+            self._pid = os.getpid()
+        return self._session
+
+    def _encode_batch(self, session, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = session.run(None, feed)[0]
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        weights = mask[:, :, None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+    def encode(self, texts, batch_size: int = 32):
+        session = self._get_session()
+        texts = list(texts)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        # Length-sorted batches, as SentenceTransformer does, keep padding low
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            out[rows] = self._encode_batch(session, [texts[i] for i in rows])
+        return normalize(out)
+
+
+def load_encoder(backend: str, model_name: str, model_dir: Path = ONNX_DIR, threads: int = None):
+    """Return an encoder for `model_name` using `backend` (one of ENCODER_BACKENDS)."""
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"encoder must be one of {ENCODER_BACKENDS}, got {backend}")
+    if backend == "torch":
+        return TorchEncoder(model_name)
+    encoder = OnnxEncoder(model_dir, backend, threads)
+    if encoder.model_name != model_name:
+        raise ValueError(f"ONNX export at {model_dir} is for {encoder.model_name}, not {model_name}")
+    logging.info(f"Using {backend} encoder from {encoder.model_path}.")
+    return encoder
+
+
+def parity(reference, candidate) -> np.ndarray:
+    """Per-row cosine similarity between two sets of embeddings."""
+    return np.einsum("ij,ij->i", normalize(reference), normalize(candidate))
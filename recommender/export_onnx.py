@@ -0,0 +1,163 @@
+import argparse
+import json
+import logging
+import shutil
+import sqlite3
+import sys
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from recommender.encoders import (
+    ONNX_CONFIG_FILE, ONNX_DIR, ONNX_FILES, PARITY_MIN_COSINE, OnnxEncoder, TorchEncoder, parity,
+)
+
+DB_PATH = ROOT / "storage" / "library.db"
+MODEL_NAME = 'all-MiniLM-L6-v2'
+PARITY_SAMPLES = 512
+# Used for the parity check when there is no database yet
+SAMPLE_QUERIES = [
+    "space robot", "a detective story set in victorian london", "cookbook", "Agatha Christie",
+    "coming of age novel about friendship", "history of the roman empire", "sci-fi",
+]
+
+def export(model_name, out_dir):
+    """Export the transformer of `model_name` to out_dir/model.onnx with its tokenizer and pooling config."""
+    import torch
+
+    torch_encoder = TorchEncoder(model_name)
+    st_model = torch_encoder.model
+    transformer, pooling = st_model[0], st_model[1]
+    # sentence-transformers >= 6 names the mode; older releases set one flag per mode
+    pooling_mode = getattr(pooling, "pooling_mode", None)
+    if pooling_mode is None:
+        pooling_mode = "mean" if pooling.pooling_mode_mean_tokens else "cls" if pooling.pooling_mode_cls_token else None
+    if pooling_mode not in ("mean", "cls"):
+        raise ValueError(f"{model_name} uses a pooling mode the ONNX encoder does not implement")
+    tokenizer = transformer.tokenizer
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    inputs = (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"])
+    axes = {0: "batch", 1: "tokens"}
+    kwargs = dict(
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes, "last_hidden_state": axes},
+        opset_version=17,
+    )
+    logging.info(f"Exporting {model_name} to ONNX...")
+    auto_model = transformer.auto_model
+    # Eager attention exports to the plain MatMul/Softmax pattern that
+    # optimize() fuses; the SDPA path does not get fused.
+    if hasattr(auto_model, "set_attn_implementation"):
+        auto_model.set_attn_implementation("eager")
+    wrapper = LastHiddenState(auto_model).eval()
+    with torch.no_grad():
+        try:
+            torch.onnx.export(wrapper, inputs, str(tmp_dir / ONNX_FILES["onnx"]), dynamo=False, **kwargs)
+        except TypeError:
+            # torch < 2.5 has no dynamo switch and always uses the TorchScript exporter
+            torch.onnx.export(wrapper, inputs, str(tmp_dir / ONNX_FILES["onnx"]), **kwargs)
+
+    optimize(tmp_dir / ONNX_FILES["onnx"], auto_model.config)
+    tokenizer.save_pretrained(str(tmp_dir))
+    config = {
+        "model_name": model_name,
+        "dim": torch_encoder.dim,
+        "max_seq_length": st_model.max_seq_length,
+        "pooling": pooling_mode,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    (tmp_dir / ONNX_CONFIG_FILE).write_text(json.dumps(config, indent=2))
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    tmp_dir.rename(out_dir)
+    return st_model
+
+def optimize(model_path, config):
+    """Fuse attention, GELU and layer norms with ONNX Runtime's transformer optimizer, if it supports the model."""
+    if config.model_type not in ("bert", "roberta", "distilbert"):
+        logging.info(f"No fusion pass for {config.model_type}; keeping the plain export.")
+        return
+    from onnxruntime.transformers import optimizer
+
+    optimized = optimizer.optimize_model(str(model_path), model_type="bert",
+                                         num_heads=config.num_attention_heads, hidden_size=config.hidden_size)
+    fused = {op: n for op, n in optimized.get_fused_operator_statistics().items() if n}
+    logging.info(f"Fused operators: {fused}")
+    optimized.save_model_to_file(str(model_path))
+
+def quantize(out_dir):
+    """Write model_int8.onnx with dynamically quantized int8 weights."""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logging.info("Quantizing weights to int8...")
+    # Shape inference cannot type the outputs of the fused contrib ops; they are all float
+    quantize_dynamic(str(out_dir / ONNX_FILES["onnx"]), str(out_dir / ONNX_FILES["onnx-int8"]),
+                     weight_type=QuantType.QInt8, extra_options={"DefaultTensorType": onnx.TensorProto.FLOAT})
+
+def parity_texts(limit=PARITY_SAMPLES):
+    """Book texts as build_embeddings.py encodes them, plus a few short queries."""
+    texts = list(SAMPLE_QUERIES)
+    if DB_PATH.exists():
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute(
+            "SELECT title, description FROM books WHERE description IS NOT NULL AND description != '' "
+            "ORDER BY RANDOM() LIMIT ?", (limit,)
+        ).fetchall()
+        conn.close()
+        texts += [f"{title or ''}: {description}" for title, description in rows]
+    return texts
+
+def check_parity(st_model, out_dir, backends):
+    """Compare each exported backend against the torch embeddings; return False if any is below the bar."""
+    texts = parity_texts()
+    reference = st_model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    ok = True
+    for backend in backends:
+        cosines = parity(reference, OnnxEncoder(out_dir, backend).encode(texts))
+        passed = cosines.min() >= PARITY_MIN_COSINE
+        ok = ok and passed
+        logging.info(f"{backend}: cosine vs torch over {len(texts)} texts min={cosines.min():.4f} "
+                     f"mean={cosines.mean():.4f} -> {'OK' if passed else 'FAIL'}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the sentence encoder to ONNX for onnxruntime")
+    parser.add_argument("--model", default=MODEL_NAME, help="SentenceTransformer name or path")
+    parser.add_argument("--out", default=str(ONNX_DIR), help="output directory")
+    parser.add_argument("--quantize", action="store_true", help="also write a dynamically quantized int8 model")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    st_model = export(args.model, out_dir)
+    backends = ["onnx"]
+    if args.quantize:
+        quantize(out_dir)
+        backends.append("onnx-int8")
+    logging.info(f"ONNX export written to {out_dir}")
+
+    if not check_parity(st_model, out_dir, backends):
+        sys.exit(f"Parity check failed: an export is below cosine {PARITY_MIN_COSINE} against torch.")
+
+if __name__ == "__main__":
+    main()
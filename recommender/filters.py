@@ -0,0 +1,65 @@
+"""Structured recommendation filters compiled to row masks over the store.
+
+Facet columns (publication year, whether a poster exists) are loaded once per
+store row. A filter such as `year_min=1990, has_poster=True` is compiled into
+a RowFilter, which the scoring kernel applies before top-k selection
+(scoring.search):
+
+    broad filters      the scores of excluded rows are set to -inf in place,
+                       one extra pass over a bool array
+    selective filters  only the matching rows are gathered and scored, so the
+                       query gets cheaper the fewer books match
+
+Either way every returned row matches the filter, and the k best matching
+rows are found, not just the matching subset of an unfiltered top-k.
+"""
+import numpy as np
+
+# Stored for books without a year; never matches a year bound
+YEAR_UNKNOWN = np.iinfo(np.int16).min
+# Filters matching at most this fraction of rows are scored by gathering their rows
+SELECTIVE_FRACTION = 0.25
+FILTER_KEYS = ("year_min", "year_max", "has_poster", "author")
+
+
+class Facets:
+    """Per-row facet columns, aligned with the store's rows."""
+
+    def __init__(self, years, posters):
+        """`years` and `posters` hold one year (or None) and poster URL (or None) per store row."""
+        # Years that are missing or not numeric (NaN fails y == y) count as unknown
+        years = np.array([int(y) if isinstance(y, (int, float)) and y == y else YEAR_UNKNOWN for y in years],
+                         dtype=np.int64)
+        self.years = np.clip(years, YEAR_UNKNOWN, np.iinfo(np.int16).max).astype(np.int16)
+        self.has_poster = np.array([bool(p) for p in posters], dtype=bool)
+
+
+class RowFilter:
+    """Rows allowed by a filter, in the forms the scoring kernel uses."""
+
+    def __init__(self, mask: np.ndarray):
+        self.mask = mask
+        self.excluded = ~mask
+        self.count = int(mask.sum())
+        self.fraction = self.count / max(len(mask), 1)
+        # Ascending row ids, only kept when gathering them beats scanning everything
+        self.rows = np.flatnonzero(mask) if self.fraction <= SELECTIVE_FRACTION else None
+
+
+def compile_filter(facets: Facets, author_index=None, year_min: int = None, year_max: int = None,
+                   has_poster: bool = None, author: str = None):
+    """Return a RowFilter for the given constraints, or None if there are none."""
+    if year_min is None and year_max is None and has_poster is None and not author:
+        return None
+    mask = np.ones(len(facets.years), dtype=bool)
+    if year_min is not None:
+        mask &= facets.years >= year_min
+    if year_max is not None:
+        mask &= (facets.years <= year_max) & (facets.years != YEAR_UNKNOWN)
+    if has_poster is not None:
+        mask &= facets.has_poster if has_poster else ~facets.has_poster
+    if author:
+        matches = np.zeros(len(mask), dtype=bool)
+        matches[author_index.match(author.strip())] = True
+        mask &= matches
+    return RowFilter(mask)
@@ -0,0 +1,139 @@
+"""Precomputed "more like this" neighbour lists, stored in SQLite.
+
+build_neighbors.py writes the top-N most similar books of every book in the
+vector store to the `book_neighbors` table:
+
+    book_neighbors       (isbn, rank) -> neighbor_isbn, score
+    book_neighbors_info  one row: store created_at, model name, N
+
+The info row ties the lists to one build of the store. When the store is
+rebuilt its created_at changes, lookups stop matching and BookRecommender
+falls back to scoring the stored vector until the job is run again.
+"""
+import sqlite3
+
+import numpy as np
+
+NEIGHBORS_TABLE = "book_neighbors"
+NEIGHBORS_INFO_TABLE = "book_neighbors_info"
+DEFAULT_NEIGHBORS = 20
+# The exact path scores QUERY_BLOCK_ROWS query rows against COLUMN_BLOCK_ROWS
+# store rows at a time (an 8 MB float32 tile) and keeps a running top-n, so
+# memory does not grow with the catalog
+QUERY_BLOCK_ROWS = 256
+COLUMN_BLOCK_ROWS = 8192
+
+
+def compute_neighbors(vectors, n: int, index=None):
+    """Yield (row, neighbour rows, scores) for every row, best first, excluding the row itself.
+
+    Without an ANN `index` blocks of rows are scored against tiles of the
+    store with one matrix product each, merging every tile into a running
+    top-n; float16/int8 tiles are upcast into a reused buffer rather than
+    copying the whole store. With an index, every row is a separate query.
+    """
+    count = vectors.shape[0]
+    n = min(n, count - 1)
+    if n <= 0:
+        for row in range(count):
+            yield row, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return
+    if index is not None:
+        for row in range(count):
+            rows, scores = index.search(vectors[row], n + 1)
+            keep = rows != row
+            yield row, rows[keep][:n], scores[keep][:n]
+        return
+
+    buffer = None
+    if vectors.dtype != np.float32:
+        buffer = np.empty((min(COLUMN_BLOCK_ROWS, count), vectors.shape[1]), dtype=np.float32)
+    for start in range(0, count, QUERY_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + QUERY_BLOCK_ROWS], dtype=np.float32)
+        own = np.arange(start, start + len(block))
+        best_scores = np.full((len(block), n), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(block), n), dtype=np.int64)
+        for column in range(0, count, COLUMN_BLOCK_ROWS):
+            tile = vectors[column:column + COLUMN_BLOCK_ROWS]
+            if buffer is not None:
+                np.copyto(buffer[:len(tile)], tile, casting="unsafe")
+                tile = buffer[:len(tile)]
+            scores = block @ tile.T
+            inside = (own >= column) & (own < column + len(tile))
+            scores[np.flatnonzero(inside), own[inside] - column] = -np.inf
+            # Top-n of the tile first, so only 2n candidates per row are merged
+            if len(tile) > n:
+                picked = np.argpartition(scores, len(tile) - n, axis=1)[:, -n:]
+                scores = np.take_along_axis(scores, picked, axis=1)
+            else:
+                picked = np.broadcast_to(np.arange(len(tile)), scores.shape)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, picked + column], axis=1)
+            keep = np.argpartition(scores, scores.shape[1] - n, axis=1)[:, -n:]
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_rows = np.take_along_axis(rows, keep, axis=1)
+        # Best first; equal scores in row order, so the lists do not depend on the tiling
+        order = np.lexsort((best_rows, -best_scores), axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        for offset in range(len(block)):
+            yield start + offset, best_rows[offset], best_scores[offset]
+
+
+def write_neighbors(conn: sqlite3.Connection, ids, neighbors, manifest: dict, n: int) -> int:
+    """Replace the neighbour tables with `neighbors` in one transaction; returns rows written.
+
+    sqlite3 only opens transactions implicitly for DML, so the DROP/CREATE
+    statements would otherwise commit on their own and readers could see
+    empty tables. An explicit BEGIN makes the whole swap atomic; readers keep
+    the old lists until COMMIT.
+    """
+    written = 0
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {NEIGHBORS_TABLE}")
+        conn.execute(f"DROP TABLE IF EXISTS {NEIGHBORS_INFO_TABLE}")
+        conn.execute(f"""
+            CREATE TABLE {NEIGHBORS_TABLE} (
+                isbn TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                neighbor_isbn TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (isbn, rank)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"CREATE TABLE {NEIGHBORS_INFO_TABLE} (store_created_at TEXT, model_name TEXT, neighbors INTEGER)")
+        for row, rows, scores in neighbors:
+            isbn = ids[row]
+            conn.executemany(
+                f"INSERT INTO {NEIGHBORS_TABLE} VALUES (?, ?, ?, ?)",
+                [(isbn, rank, ids[r], float(s)) for rank, (r, s) in enumerate(zip(rows, scores))],
+            )
+            written += len(rows)
+        conn.execute(f"INSERT INTO {NEIGHBORS_INFO_TABLE} VALUES (?, ?, ?)",
+                     (manifest["created_at"], manifest.get("model_name"), n))
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = isolation_level
+    return written
+
+
+def lookup_neighbors(conn: sqlite3.Connection, isbn: str, manifest: dict, limit: int):
+    """Return [(neighbor_isbn, score)] for `isbn`, or None if there are no current lists for this store."""
+    try:
+        info = conn.execute(f"SELECT store_created_at, neighbors FROM {NEIGHBORS_INFO_TABLE}").fetchone()
+    except sqlite3.OperationalError:
+        # Job never run against this database
+        return None
+    if info is None or info[0] != manifest.get("created_at") or info[1] < limit:
+        return None
+    return conn.execute(
+        f"SELECT neighbor_isbn, score FROM {NEIGHBORS_TABLE} WHERE isbn = ? ORDER BY rank LIMIT ?",
+        (isbn, limit),
+    ).fetchall()
@@ -0,0 +1,97 @@
+"""LRU cache of query text -> query embedding.
+
+Encoding the query is the most expensive step of a recommendation and the
+same queries come back all the time. Keys are the lowercased,
+whitespace-collapsed query. all-MiniLM-L6-v2 is uncased, so this does not
+change the vector. On a miss the normalized text is what gets encoded, so a
+hit always returns exactly what a miss would have computed.
+
+The cache can be saved to an .npz file on shutdown and reloaded at
+startup. Saved entries are tied to the model name and are discarded if it
+no longer matches.
+"""
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    def __init__(self, maxsize: int, model_name: str):
+        self.maxsize = maxsize
+        self.model_name = model_name
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        """Return the cached vector for a normalized query, or None."""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: str, vector) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def save(self, path: Path) -> None:
+        """Write the entries (least recently used first) to `path` atomically.
+
+        Every writer gets its own temporary file, so gunicorn workers saving on
+        shutdown at the same time cannot interleave; the last rename wins.
+        """
+        with self._lock:
+            keys = list(self._entries)
+            vectors = list(self._entries.values())
+        if not keys:
+            return
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, model_name=np.array(self.model_name), keys=np.array(keys), vectors=np.stack(vectors))
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        logging.info(f"Saved {len(keys)} cached query embeddings to {path}")
+
+    def load(self, path: Path) -> int:
+        """Load entries saved by save(); returns how many were restored.
+
+        An unreadable file (truncated, corrupt, wrong layout) is logged and
+        treated as an empty cache, so it can never fail the recommender's load.
+        """
+        path = Path(path)
+        if not path.exists():
+            return 0
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["model_name"]) != self.model_name:
+                    logging.info(f"Discarding query cache built for {data['model_name']} (model is {self.model_name}).")
+                    return 0
+                keys, vectors = data["keys"].tolist(), data["vectors"]
+        except Exception as e:
+            logging.warning(f"Could not read query cache {path}: {e}")
+            return 0
+        for key, vector in zip(keys[-self.maxsize:], vectors[-self.maxsize:]):
+            self.put(key, vector)
+        return min(len(keys), self.maxsize)
@@ -1,68 +1,303 @@
-import pickle
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 ROOT = Path(__file__).resolve().parent.parent
-EMBEDDINGS_PATH = ROOT / "recommender" / "embeddings.pkl"
+sys.path.insert(0, str(ROOT))
+from monitoring.metrics import cache_result, timed
+from recommender.ann import DEFAULT_EF, DEFAULT_NPROBE, filtered_search, load_index
+from recommender.author_index import AuthorIndex
+from recommender.encoders import ONNX_DIR, load_encoder
+from recommender.filters import FILTER_KEYS, Facets, compile_filter
+from recommender.neighbors import lookup_neighbors
+from recommender.query_cache import QueryEmbeddingCache, normalize_query
+from recommender.scoring import normalize, quantize_int8
+from recommender.store import STORE_DIR, open_int8, open_store, resolve_store
+
+DB_PATH = ROOT / "storage" / "library.db"
+
+# Columns returned for each recommendation when no `fields` are requested
+METADATA_FIELDS = ("isbn", "title", "author", "year", "poster_url", "book_url", "description")
+
+# Score with the int8 copy of the vectors and re-rank the best candidates in float
+USE_INT8 = os.getenv("RECOMMENDER_INT8", "").lower() in ("1", "true", "yes")
+
+# Nearest-neighbour backend: "auto" (whatever the store was built with), "exact",
+# "hnsw" or "ivfpq", plus their recall/latency knobs
+ANN_BACKEND = os.getenv("RECOMMENDER_ANN", "auto")
+ANN_EF = int(os.getenv("RECOMMENDER_ANN_EF", DEFAULT_EF))
+ANN_NPROBE = int(os.getenv("RECOMMENDER_ANN_NPROBE", DEFAULT_NPROBE))
+
+# Query embedding LRU size (0 disables it) and optional file it is persisted to
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH")
+
+# Query encoder: "torch" (SentenceTransformer), or "onnx" / "onnx-int8" on ONNX
+# Runtime from the export_onnx.py output in RECOMMENDER_ONNX_DIR
+ENCODER_BACKEND = os.getenv("RECOMMENDER_ENCODER", "torch")
+ONNX_MODEL_DIR = Path(os.getenv("RECOMMENDER_ONNX_DIR", str(ONNX_DIR)))
+
+# Compiled filter masks kept for repeated filter combinations
+FILTER_CACHE_SIZE = 64
+
+# Load stages in order, used to report progress while warming up
+LOAD_STAGES = ("embeddings", "metadata", "model")
+# Seconds before a failed load is retried; doubles with each consecutive failure
+LOAD_RETRY_SECONDS = float(os.getenv("RECOMMENDER_LOAD_RETRY", "5"))
+LOAD_RETRY_MAX_SECONDS = 300
+
+def configure_threads():
+    """Apply RECOMMENDER_THREADS to torch's intra-op thread pool, if torch is loaded.
+
+    Used to split cores between gunicorn workers instead of letting every
+    worker start one thread per core. The ONNX encoders read the same variable
+    when they create their session.
+    """
+    threads = os.getenv("RECOMMENDER_THREADS")
+    if threads and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(int(threads))
 
 class BookRecommender:
-    def __init__(self):
-        self.model = None
+    def __init__(self, int8: bool = USE_INT8, ann: str = ANN_BACKEND, ef: int = ANN_EF, nprobe: int = ANN_NPROBE,
+                 encoder: str = ENCODER_BACKEND):
+        self.int8 = int8
+        self.ann = ann
+        self.ef = ef
+        self.nprobe = nprobe
+        self.encoder_backend = encoder
+        self.encoder = None
         self.embeddings = None
-        self.metadatas = None
+        self.embeddings_int8 = None
+        self.index = None
         self.ids = None
+        self._id_order = None
+        self.author_index = None
+        self.facets = None
+        self._filter_cache = OrderedDict()
+        # Requests run on a threadpool; the cache's get/move/evict must not interleave
+        self._filter_lock = threading.Lock()
+        self.query_cache = None
+        self.manifest = None
         self.loaded = False
+        self.state = "idle"  # idle -> loading -> ready | failed
+        self.stage = None
+        self.timings = {}
+        self.error = None
+        self.failures = 0
+        self.failed_at = None
+        self._load_lock = threading.Lock()
+        self._retry_lock = threading.Lock()
         
     def load(self):
-        """Load model and embeddings."""
-        if not EMBEDDINGS_PATH.exists():
-            raise FileNotFoundError(f"Embeddings file not found at {EMBEDDINGS_PATH}. Run build_embeddings.py first.")
-            
-        logging.info(f"Loading embeddings from {EMBEDDINGS_PATH}...")
-        with open(EMBEDDINGS_PATH, 'rb') as f:
-            data = pickle.load(f)
-            
-        self.embeddings = data['embeddings']
-        self.metadatas = data['metadatas']
-        self.ids = data['ids']
-        model_name = data.get('model_name', 'all-MiniLM-L6-v2')
-        
-        logging.info(f"Loading model {model_name}...")
-        self.model = SentenceTransformer(model_name)
-        self.loaded = True
-        logging.info("Recommender ready.")
+        """Load model and embeddings, recording how long each stage takes."""
+        with self._load_lock:
+            if self.loaded:
+                return
+            self.state = "loading"
+            self.error = None
+            self.timings = {}
+            try:
+                self._load()
+            except Exception as e:
+                self.failures += 1
+                self.failed_at = time.monotonic()
+                self.state = "failed"
+                self.error = str(e)
+                raise
+            self.stage = None
+            self.failures = 0
+            self.state = "ready"
+            self.loaded = True
+
+        breakdown = ", ".join(f"{k}={v:.2f}s" for k, v in self.timings.items())
+        logging.info(f"Recommender ready in {sum(self.timings.values()):.2f}s ({breakdown}).")
+
+    def _load(self):
+        self.stage = "embeddings"
+        start = time.perf_counter()
+        store_dir = resolve_store(STORE_DIR)
+        logging.info(f"Opening embedding store at {store_dir}...")
+        # Vectors stay memory-mapped; pages are read lazily by the OS
+        self.manifest, self.embeddings, self.ids = open_store(store_dir)
+        model_name = self.manifest.get('model_name', 'all-MiniLM-L6-v2')
+        if not self.manifest.get("normalized"):
+            logging.warning("Embedding store has unnormalized vectors; normalizing in memory. "
+                            "Rebuild it to keep the vectors memory-mapped.")
+            self.embeddings = normalize(self.embeddings)
+        if self.int8:
+            self.embeddings_int8 = open_int8(store_dir)
+            if self.embeddings_int8 is None:
+                logging.info("Store has no int8 vectors; quantizing in memory...")
+                self.embeddings_int8, _ = quantize_int8(self.embeddings)
+        self.index = load_index(store_dir, self.manifest, self.embeddings, self.embeddings_int8,
+                                backend=self.ann, ef=self.ef, nprobe=self.nprobe)
+        logging.info(f"Using {self.index.name} vector search.")
+        # Sort order of the ISBNs, for binary-search lookups of a book's row
+        self._id_order = np.argsort(self.ids, kind="stable")
+        self.timings["embeddings"] = time.perf_counter() - start
+
+        # ONNX vectors are close to, not identical with, the torch ones, so they are cached apart
+        cache_model = model_name if self.encoder_backend == "torch" else f"{model_name}:{self.encoder_backend}"
+        self.query_cache = QueryEmbeddingCache(QUERY_CACHE_SIZE, cache_model)
+        if QUERY_CACHE_PATH and QUERY_CACHE_SIZE > 0:
+            restored = self.query_cache.load(QUERY_CACHE_PATH)
+            logging.info(f"Restored {restored} cached query embeddings.")
+
+        # Only an author index (for the keyword boost) and the filter facets are
+        # kept in memory; everything else is fetched from SQLite for the rows
+        # being returned.
+        self.stage = "metadata"
+        start = time.perf_counter()
+        conn = sqlite3.connect(DB_PATH)
+        by_isbn = {isbn: rest for isbn, *rest in conn.execute("SELECT isbn, author, year, poster_url FROM books")}
+        conn.close()
+        rows = [by_isbn.get(isbn, (None, None, None)) for isbn in self.ids.tolist()]
+        self.author_index = AuthorIndex([author for author, _, _ in rows])
+        self.facets = Facets([year for _, year, _ in rows], [poster for _, _, poster in rows])
+        with self._filter_lock:
+            self._filter_cache.clear()
+        self.timings["metadata"] = time.perf_counter() - start
+
+        self.stage = "model"
+        start = time.perf_counter()
+        # Loaded last: the torch encoder imports torch, which costs seconds and
+        # hundreds of MB; the ONNX encoders avoid it altogether.
+        logging.info(f"Loading {self.encoder_backend} encoder for {model_name}...")
+        self.encoder = load_encoder(self.encoder_backend, model_name, ONNX_MODEL_DIR)
+        configure_threads()
+        self.timings["model"] = time.perf_counter() - start
+
+    def load_in_background(self) -> threading.Thread:
+        """Start load() in a daemon thread; failures are kept in `state`/`error`."""
+        def run():
+            try:
+                self.load()
+            except Exception as e:
+                logging.warning(f"Could not load recommender model: {e}")
+
+        thread = threading.Thread(target=run, name="recommender-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def retry_delay(self) -> float:
+        """Seconds to wait after the last failed load before trying again."""
+        return min(LOAD_RETRY_SECONDS * 2 ** max(self.failures - 1, 0), LOAD_RETRY_MAX_SECONDS)
+
+    def retry_in(self) -> float:
+        """Seconds until a failed load may be retried (0 when due), or None unless failed."""
+        if self.state != "failed":
+            return None
+        return max(self.retry_delay() - (time.monotonic() - self.failed_at), 0.0)
 
-    def recommend(self, query: str, top_k: int = 6):
-        """Recommend books based on query string."""
+    def retry_if_due(self) -> bool:
+        """Start another background load if the last one failed at least retry_delay() ago.
+
+        Lets a server that started before its embeddings were built pick them up
+        without a restart. Returns True if a retry was started.
+        """
+        with self._retry_lock:
+            if self.retry_in() != 0.0:
+                return False
+            self.state = "loading"
+        self.load_in_background()
+        return True
+
+    def status(self) -> dict:
+        """Readiness summary: state, current stage, progress (0-1) and stage timings."""
+        if self.state == "ready":
+            progress = 1.0
+        elif self.stage in LOAD_STAGES:
+            progress = LOAD_STAGES.index(self.stage) / len(LOAD_STAGES)
+        else:
+            progress = 0.0
+        return {
+            "state": self.state,
+            "stage": self.stage,
+            "progress": round(progress, 2),
+            "timings": {k: round(v, 3) for k, v in self.timings.items()},
+            "error": self.error,
+            "retry_in": None if self.state != "failed" else round(self.retry_in(), 1),
+        }
+
+    def save_query_cache(self):
+        """Persist the query embedding cache to QUERY_CACHE_PATH, if configured."""
+        if QUERY_CACHE_PATH and self.query_cache is not None:
+            self.query_cache.save(QUERY_CACHE_PATH)
+
+    def encode_query(self, query: str):
+        """Return the unit-length embedding of `query`, using the LRU cache."""
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        cache_result("query_embedding", vector is not None)
+        if vector is None:
+            with timed("model_encode"):
+                vector = self.encoder.encode([key])[0]
+            self.query_cache.put(key, vector)
+        return vector
+
+    def row_filter(self, filters: dict = None):
+        """Compile `filters` (keys from FILTER_KEYS) into a RowFilter, reusing recent ones."""
+        filters = {k: v for k, v in (filters or {}).items() if v is not None and v != ""}
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        if not filters:
+            return None
+        key = tuple(sorted(filters.items()))
+        with self._filter_lock:
+            row_filter = self._filter_cache.get(key)
+            if row_filter is not None:
+                self._filter_cache.move_to_end(key)
+                return row_filter
+        # Compiled outside the lock; two requests may build the same filter, the last one is kept
+        row_filter = compile_filter(self.facets, self.author_index, **filters)
+        with self._filter_lock:
+            self._filter_cache[key] = row_filter
+            self._filter_cache.move_to_end(key)
+            while len(self._filter_cache) > FILTER_CACHE_SIZE:
+                self._filter_cache.popitem(last=False)
+        return row_filter
+
+    def recommend(self, query: str, top_k: int = 6, fields=None, filters: dict = None):
+        """Recommend books based on query string.
+
+        `fields` optionally limits the metadata keys returned for each book;
+        `score` is always included. `filters` (year_min, year_max, has_poster,
+        author) restrict the candidates before ranking, so up to top_k matching
+        books are returned.
+        """
         if not self.loaded:
             self.load()
+        row_filter = self.row_filter(filters)
             
         # 1. Semantic Search
-        query_vec = self.model.encode([query])
-        scores = cosine_similarity(query_vec, self.embeddings).flatten()
-        
-        # Sanitize scores to avoid JSON errors
-        scores = np.nan_to_num(scores, nan=0.0, posinf=1.0, neginf=0.0)
-        
-        # Get top semantic results (fetch more candidates to blend)
-        top_n = min(len(scores), 50)
-        top_indices = scores.argsort()[-top_n:][::-1]
+        query_vec = self.encode_query(query)
+
+        with timed("similarity"):
+            # Stored vectors are unit length, so cosine similarity is a dot product.
+            # Get top semantic results (fetch more candidates to blend)
+            top_indices, top_scores = filtered_search(
+                self.index, self.embeddings, self.embeddings_int8, query_vec, 50, row_filter
+            )
         
+        # (row, score) pairs; metadata is only fetched for the final top_k
         semantic_results = []
         seen_isbns = set()
         
-        for idx in top_indices:
-            score = float(scores[idx])
-            meta = self.metadatas[idx]
-            if meta['isbn'] not in seen_isbns:
-                semantic_results.append({**meta, "score": score})
-                seen_isbns.add(meta['isbn'])
+        for idx, score in zip(top_indices, top_scores):
+            isbn = self.ids[idx]
+            if isbn not in seen_isbns:
+                semantic_results.append((int(idx), float(score)))
+                seen_isbns.add(isbn)
             
         # 2. Keyword Search (Boost Author matches)
         # This allows "searching by author" within the recommendation engine
@@ -71,22 +306,94 @@ class BookRecommender:
         
         # Only scan if query is meaningful (avoid short purely numeric queries potentially)
         if len(query_lower) > 2:
-            for meta in self.metadatas:
-                # Check for author match
-                if meta.get('author') and query_lower in meta['author'].lower():
-                    if meta['isbn'] not in seen_isbns:
+            with timed("author_scan"):
+                # Enough rows to fill top_k even if every semantic hit is among them;
+                # with a filter, rows it excludes do not count towards that
+                limit = top_k + len(seen_isbns) if row_filter is None else None
+                for row in self.author_index.match(query_lower, limit=limit):
+                    if row_filter is not None and not row_filter.mask[row]:
+                        continue
+                    isbn = self.ids[row]
+                    if isbn not in seen_isbns:
                         # Give a boosted score (above 1.0) so they appear first
-                        author_matches.append({**meta, "score": 2.0})
-                        seen_isbns.add(meta['isbn'])
+                        author_matches.append((int(row), 2.0))
+                        seen_isbns.add(isbn)
+                        # All boosted matches tie, so later ones can never make the top_k
+                        if len(author_matches) >= top_k:
+                            break
         
         # 3. Combine Results
         # Author matches first, then semantic matches
         final_results = author_matches + semantic_results
         
         # Sort by score descending
-        final_results.sort(key=lambda x: x['score'], reverse=True)
+        final_results.sort(key=lambda x: x[1], reverse=True)
         
-        return final_results[:top_k]
+        return self._with_metadata(final_results[:top_k], fields)
+
+    def row_of(self, isbn: str):
+        """Row of `isbn` in the vector store, or None if the book has no embedding."""
+        pos = np.searchsorted(self.ids, isbn, sorter=self._id_order)
+        if pos < len(self.ids) and self.ids[self._id_order[pos]] == isbn:
+            return int(self._id_order[pos])
+        return None
+
+    def similar(self, isbn: str, top_k: int = 6, fields=None):
+        """Books most similar to the book `isbn`, or None if it has no embedding.
+
+        Uses the lists precomputed by build_neighbors.py when they match the
+        current store; otherwise the book's stored vector is scored against the
+        index. Neither path runs the model.
+        """
+        if not self.loaded:
+            self.load()
+        row = self.row_of(isbn)
+        if row is None:
+            return None
+
+        with timed("sqlite_query"):
+            conn = sqlite3.connect(DB_PATH)
+            try:
+                neighbors = lookup_neighbors(conn, isbn, self.manifest, top_k)
+            finally:
+                conn.close()
+        if neighbors is not None:
+            return self._books(neighbors, fields)
+
+        with timed("similarity"):
+            rows, scores = self.index.search(self.embeddings[row], top_k + 1)
+        results = [(int(r), float(s)) for r, s in zip(rows, scores) if r != row]
+        return self._with_metadata(results[:top_k], fields)
+
+    def _with_metadata(self, results, fields=None):
+        """Turn (row, score) pairs into book dicts read from SQLite by ISBN."""
+        return self._books([(str(self.ids[row]), score) for row, score in results], fields)
+
+    def _books(self, results, fields=None):
+        """Turn (isbn, score) pairs into book dicts read from SQLite."""
+        columns = list(fields or METADATA_FIELDS)
+        select = list(dict.fromkeys(["isbn", *columns]))
+        isbns = [isbn for isbn, _ in results]
+        if not isbns:
+            return []
+
+        with timed("sqlite_query"):
+            conn = sqlite3.connect(DB_PATH)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                f"SELECT {', '.join(select)} FROM books WHERE isbn IN ({', '.join('?' * len(isbns))})",
+                isbns,
+            ).fetchall()
+            conn.close()
+
+        by_isbn = {r["isbn"]: r for r in rows}
+        books = []
+        for isbn, (_, score) in zip(isbns, results):
+            book = by_isbn.get(isbn)
+            # Books deleted since the store was built are skipped
+            if book is not None:
+                books.append({**{c: book[c] for c in columns}, "score": score})
+        return books
 
 if __name__ == "__main__":
     rec = BookRecommender()
@@ -0,0 +1,213 @@
+"""Versioned on-disk embedding store.
+
+Layout of a store directory (recommender/index by default):
+
+    manifest.json     format version, model name, encoder backend, dtype and shape
+    vectors.npy       (n, dim) float32 or float16 unit-length rows, opened with mmap
+    ids.npy           (n,) ISBNs; row i of vectors.npy belongs to ids[i]
+    hashes.npy        (n, 16) uint8 content hash of the text each vector was encoded from
+    vectors_int8.npy  optional int8 quantized copy of vectors.npy
+    ann_*             optional approximate nearest-neighbour index (see ann.py)
+
+Only vectors and row ids are stored. Book metadata is read from SQLite on
+demand, so fixing a title or poster never requires rewriting the store.
+
+Each build is written to its own sibling directory (index.v-*), and
+recommender/index is a symlink to the current one. Publishing a build
+replaces that symlink with a single os.replace, so the store path never goes
+missing. Readers resolve the link once with resolve_store() and open every
+file of one version through it.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from recommender.ann import build_ann
+from recommender.scoring import BLOCK_ROWS, normalize, quantize_int8
+
+ROOT = Path(__file__).resolve().parent.parent
+STORE_DIR = ROOT / "recommender" / "index"
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+HASHES_FILE = "hashes.npy"
+INT8_FILE = "vectors_int8.npy"
+SUPPORTED_DTYPES = ("float32", "float16")
+VERSION_INFIX = ".v-"
+# Where symlinks are unavailable the store is swapped with two renames, and
+# open_store retries for up to OPEN_RETRIES * OPEN_RETRY_SECONDS in between
+OPEN_RETRIES = 5
+OPEN_RETRY_SECONDS = 0.1
+
+
+def write_store(
+    ids, embeddings, model_name: str, store_dir: Path = STORE_DIR, dtype: str = "float32", int8: bool = False,
+    ann: str = None, ann_params: dict = None, hashes=None, encoder: str = "torch",
+) -> dict:
+    """Write a complete store to a new version directory and publish it as `store_dir`.
+
+    Vectors are L2-normalized before saving so readers can score them with a
+    plain dot product straight from the mmap. `embeddings` may itself be a
+    memmap: normalizing, casting and int8 quantization run BLOCK_ROWS rows at a
+    time into memory-mapped outputs, so memory stays bounded however large the
+    catalog is. Processes that still have the old vectors mapped keep reading
+    a consistent copy after the old version is removed; see publish().
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}, got {dtype}")
+    if len(ids) != len(embeddings):
+        raise ValueError(f"{len(ids)} ids for {len(embeddings)} vectors")
+
+    store_dir = Path(store_dir)
+    store_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=store_dir.name + VERSION_INFIX, dir=store_dir.parent))
+    os.chmod(tmp_dir, 0o755)
+    try:
+        manifest = _write_version(tmp_dir, ids, embeddings, model_name, encoder, dtype, int8, ann, ann_params, hashes)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    publish(tmp_dir, store_dir)
+    return manifest
+
+
+def _write_version(tmp_dir: Path, ids, embeddings, model_name, encoder, dtype, int8, ann, ann_params, hashes) -> dict:
+    shape = embeddings.shape if getattr(embeddings, "ndim", 0) == 2 else (len(ids), 0)
+    vectors = np.lib.format.open_memmap(tmp_dir / VECTORS_FILE, mode="w+", dtype=dtype, shape=shape)
+    for start in range(0, shape[0], BLOCK_ROWS):
+        vectors[start:start + BLOCK_ROWS] = normalize(embeddings[start:start + BLOCK_ROWS])
+    vectors.flush()
+    np.save(tmp_dir / IDS_FILE, np.asarray([str(i) for i in ids]), allow_pickle=False)
+    if hashes is not None:
+        # uint8 rows rather than an S16 array, which would strip trailing NUL bytes
+        digests = np.frombuffer(b"".join(hashes), dtype=np.uint8).reshape(len(ids), -1)
+        np.save(tmp_dir / HASHES_FILE, digests, allow_pickle=False)
+    int8_scale = None
+    if int8:
+        # Quantized from the stored vectors, which for float16 stores are the rounded ones readers see
+        quantized = np.lib.format.open_memmap(tmp_dir / INT8_FILE, mode="w+", dtype=np.int8, shape=shape)
+        int8_scale = quantize_int8(vectors, out=quantized)[1]
+        quantized.flush()
+        del quantized
+    ann_entry = build_ann(ann, vectors, tmp_dir, **(ann_params or {})) if ann else None
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "model_name": model_name,
+        # Backend that encoded the vectors (see encoders.py); torch and ONNX ones differ slightly
+        "encoder": encoder,
+        "dtype": dtype,
+        "count": int(shape[0]),
+        "dim": int(shape[1]),
+        "normalized": True,
+        "int8_scale": int8_scale,
+        "ann": ann_entry,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    with open(tmp_dir / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+    del vectors
+    return manifest
+
+
+def publish(version_dir: Path, store_dir: Path = STORE_DIR) -> None:
+    """Make `store_dir` point at `version_dir` and remove all but the version it replaces.
+
+    The symlink is created beside `store_dir` and renamed over it, which is
+    atomic: a reader sees either the old or the new version, never no store.
+    The replaced version is kept until the next publish, so a reader that
+    resolved it just before the switch can still open all of its files;
+    older ones are removed, which does not disturb processes that have them
+    mapped. Without symlink support (Windows without developer mode) the
+    directories are swapped with two renames instead, and open_store waits
+    out the moment in between.
+    """
+    version_dir, store_dir = Path(version_dir), Path(store_dir)
+    old_dir = store_dir.with_name(store_dir.name + ".old")
+    link = store_dir.with_name(f".{store_dir.name}.link")
+    previous = resolve_store(store_dir) if store_dir.is_symlink() else None
+    shutil.rmtree(old_dir, ignore_errors=True)
+    try:
+        if os.path.lexists(link):
+            os.unlink(link)
+        os.symlink(version_dir.name, link, target_is_directory=True)
+    except OSError:
+        link = None
+    if link is None or (store_dir.exists() and not store_dir.is_symlink()):
+        # No symlinks, or a store written before versions existed: swap the directories
+        if os.path.lexists(store_dir):
+            os.replace(store_dir, old_dir)
+    if link is not None:
+        os.replace(link, store_dir)
+    else:
+        os.replace(version_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    for stale in store_dir.parent.glob(store_dir.name + VERSION_INFIX + "*"):
+        if stale not in (version_dir, previous):
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def read_manifest(store_dir: Path = STORE_DIR) -> dict:
+    path = Path(store_dir) / MANIFEST_FILE
+    if not path.exists():
+        raise FileNotFoundError(f"Embedding store not found at {store_dir}. Run build_embeddings.py first.")
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported embedding store version {manifest.get('format_version')} "
+            f"(expected {FORMAT_VERSION}). Rebuild with build_embeddings.py."
+        )
+    return manifest
+
+
+def resolve_store(store_dir: Path = STORE_DIR) -> Path:
+    """The version directory `store_dir` currently points at.
+
+    Open every file of a store through the resolved path (open_store,
+    open_int8, open_hashes, ann.load_index), so they all come from the same
+    build even if a new one is published meanwhile.
+    """
+    return Path(os.path.realpath(store_dir))
+
+
+def open_store(store_dir: Path = STORE_DIR):
+    """Return (manifest, vectors, ids) with vectors memory-mapped read-only."""
+    store_dir = Path(store_dir)
+    old_dir = store_dir.with_name(store_dir.name + ".old")
+    for attempt in range(OPEN_RETRIES):
+        try:
+            manifest = read_manifest(store_dir)
+            vectors = np.load(store_dir / VECTORS_FILE, mmap_mode="r")
+            ids = np.load(store_dir / IDS_FILE)
+            if len(ids) != vectors.shape[0] or len(ids) != manifest["count"]:
+                raise ValueError(f"Corrupt embedding store: {len(ids)} ids for {vectors.shape[0]} vectors "
+                                 f"(manifest lists {manifest['count']})")
+            # An unchanged manifest means no rename swap (see publish) replaced files meanwhile
+            if read_manifest(store_dir) == manifest:
+                return manifest, vectors, ids
+        except (FileNotFoundError, ValueError):
+            # Retry only while a swap is in progress or a store has appeared since
+            if attempt == OPEN_RETRIES - 1 or not (old_dir.exists() or store_dir.exists()):
+                raise
+        time.sleep(OPEN_RETRY_SECONDS)
+    raise RuntimeError(f"Embedding store at {store_dir} kept changing while it was opened")
+
+
+def open_int8(store_dir: Path = STORE_DIR):
+    """Return the memory-mapped int8 copy of the vectors, or None if it was not built."""
+    path = Path(store_dir) / INT8_FILE
+    return np.load(path, mmap_mode="r") if path.exists() else None
+
+
+def open_hashes(store_dir: Path = STORE_DIR):
+    """Return the per-row content hashes as bytes, or None for stores written without them."""
+    path = Path(store_dir) / HASHES_FILE
+    return [row.tobytes() for row in np.load(path)] if path.exists() else None
@@ -2,5 +2,12 @@
 echo "Current working directory: $(pwd)"
 echo "Environment PORT: $PORT"
 PORT="${PORT:-8000}"
+WEB_CONCURRENCY="${WEB_CONCURRENCY:-1}"
+if [ "$WEB_CONCURRENCY" -gt 1 ]; then
+    # Model and vectors are loaded once in the master and shared with the forked workers
+    echo "Starting Gunicorn with $WEB_CONCURRENCY Uvicorn workers on port $PORT..."
+    export PORT WEB_CONCURRENCY
+    exec gunicorn -c gunicorn.conf.py API.main:app
+fi
 echo "Starting Uvicorn on port $PORT..."
 exec uvicorn API.main:app --host 0.0.0.0 --port $PORT
@@ -5,11 +5,15 @@ an SQLite database used by the API and pipeline tasks.
 """
 from pathlib import Path
 import sqlite3
+import sys
 from typing import Optional
 import pandas as pd
 
 # Configuration
 ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+from monitoring.run_report import stage
+
 INPUT_CSV = ROOT / "data" / "processed" / "clean_description.csv"
 DB_PATH = ROOT / "storage" / "library.db"
 TABLE_NAME = "books"
@@ -52,6 +56,7 @@ def create_table(conn: sqlite3.Connection) -> None:
     """Create the books table if it does not exist.
 
     Adds a UNIQUE constraint on isbn so that INSERT OR IGNORE works predictably.
+    `updated_at` records when a row was written and backs incremental exports.
     """
     cursor = conn.cursor()
 
@@ -67,14 +72,33 @@ def create_table(conn: sqlite3.Connection) -> None:
         acc_date TEXT,
         place_publisher TEXT,
         poster_url TEXT,
-        book_url TEXT
+        book_url TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
     );
     """)
+    ensure_updated_at(conn)
 
     conn.commit()
     print("Table ensured.")
 
 
+def ensure_updated_at(conn: sqlite3.Connection) -> None:
+    """Add and backfill the updated_at column on databases created before it existed.
+
+    SQLite cannot ALTER TABLE ... ADD COLUMN with a CURRENT_TIMESTAMP default,
+    so existing rows are stamped with the migration time instead.
+    """
+    cursor = conn.cursor()
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({TABLE_NAME})")}
+    if "updated_at" not in columns:
+        cursor.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN updated_at TEXT")
+        cursor.execute(f"UPDATE {TABLE_NAME} SET updated_at = CURRENT_TIMESTAMP")
+        print("Added updated_at column.")
+    cursor.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_updated_at ON {TABLE_NAME} (updated_at)"
+    )
+
+
 def _normalize_row(row: pd.Series) -> tuple:
     """Map a CSV row into the DB tuple in correct order and types."""
     isbn = str(row.get("ISBN", "")).strip() or None
@@ -100,8 +124,8 @@ def _normalize_row(row: pd.Series) -> tuple:
     return (isbn, title, author, description, source, year, acc_date, place, poster_url, book_url)
 
 
-def insert_data(conn: sqlite3.Connection, df: pd.DataFrame) -> None:
-    """Insert rows from DataFrame into the books table.
+def insert_data(conn: sqlite3.Connection, df: pd.DataFrame) -> int:
+    """Insert rows from DataFrame into the books table; returns the number inserted.
 
     Uses executemany for speed and INSERT OR IGNORE to avoid duplicates (isbn unique).
     """
@@ -118,6 +142,7 @@ def insert_data(conn: sqlite3.Connection, df: pd.DataFrame) -> None:
     cursor.executemany(insert_sql, tuples)
     conn.commit()
     print(f"Inserted {cursor.rowcount} rows (attempted {len(tuples)}).")
+    return cursor.rowcount
 
 
 def verify_data(conn: sqlite3.Connection) -> int:
@@ -131,11 +156,15 @@ def verify_data(conn: sqlite3.Connection) -> int:
 
 def main_db() -> None:
     """Run the full import: load CSV -> ensure table -> insert -> verify."""
-    df = load_data(INPUT_CSV)
+    with stage("load_data") as s:
+        df = load_data(INPUT_CSV)
+        s.rows_out = len(df)
     conn = create_connection(DB_PATH)
     create_table(conn)
-    insert_data(conn, df)
-    verify_data(conn)
+    with stage("insert_data", rows_in=len(df)) as s:
+        s.rows_out = insert_data(conn, df)
+    with stage("verify_data") as s:
+        s.rows_out = verify_data(conn)
     conn.close()
 
 
@@ -0,0 +1,83 @@
+"""Streaming export of the books table.
+
+Rows are read from a server-side SQLite cursor with fetchmany() and encoded
+one batch at a time, so memory use is bounded by the batch size rather than
+the size of the table.
+"""
+import csv
+import io
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import orjson
+
+TABLE_NAME = "books"
+EXPORT_FORMATS = ("ndjson", "csv")
+BATCH_SIZE = 1000
+
+
+def normalize_timestamp(value: str) -> str:
+    """Convert an ISO date/datetime into SQLite's CURRENT_TIMESTAMP format.
+
+    Raises ValueError for values that are not ISO 8601.
+    """
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def has_column(conn: sqlite3.Connection, column: str) -> bool:
+    return column in {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+
+
+def _encode_ndjson(columns: list, rows: list) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def _encode_csv(rows: list) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def iter_export(
+    db_path: Path,
+    columns: Optional[list] = None,
+    fmt: str = "ndjson",
+    updated_since: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[bytes]:
+    """Yield the books table as encoded chunks of at most `batch_size` rows.
+
+    `columns` must already be validated against the table (None means all
+    columns) and `updated_since` normalized with normalize_timestamp().
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    # The generator is resumed from Starlette's threadpool, so successive
+    # batches may be fetched from different threads.
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {TABLE_NAME}"
+        params = ()
+        if updated_since:
+            sql += " WHERE updated_at >= ?"
+            params = (updated_since,)
+        sql += " ORDER BY id"
+
+        cursor = conn.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        if fmt == "csv":
+            yield _encode_csv([names])
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield _encode_ndjson(names, rows) if fmt == "ndjson" else _encode_csv(rows)
+    finally:
+        conn.close()
@@ -0,0 +1,41 @@
+"""Import-time budgets of the pipeline entry points (benchmarks/check_import_time.py).
+
+Each module is imported in a fresh interpreter with -X importtime. Its
+cumulative import time must stay within BUDGETS_MS, and it must not pull in
+torch, sentence-transformers, transformers or sklearn, which only the
+recommender may load, lazily.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+from check_import_time import BUDGETS_MS, HEAVY_MODULES, import_profile
+
+# Best of this many fresh imports is compared with the budget, so one slow
+# run on a busy machine does not fail the check
+ATTEMPTS = 3
+
+
+def profile_or_skip(module: str) -> dict:
+    try:
+        return import_profile(module)
+    except RuntimeError as e:
+        if "ModuleNotFoundError" in str(e):
+            pytest.skip(f"{module} dependencies are not installed: {e}")
+        raise
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_import_has_no_heavy_modules(module):
+    profile = profile_or_skip(module)
+    heavy = sorted({name.split(".")[0] for name in profile} & set(HEAVY_MODULES))
+    assert not heavy, f"importing {module} loads {', '.join(heavy)}"
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS_MS))
+def test_import_time_within_budget(module):
+    elapsed_ms = min(profile_or_skip(module).get(module, 0) / 1000 for _ in range(ATTEMPTS))
+    assert elapsed_ms <= BUDGETS_MS[module], f"importing {module} took {elapsed_ms:.1f} ms (budget {BUDGETS_MS[module]} ms)"
@@ -1,7 +1,12 @@
+import sys
+from pathlib import Path
 import pandas as pd
 import re 
 import html 
 
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from monitoring.run_report import stage
+
 
 INPUT_CSV = "../data/processed/dau_with_description.csv"
 OUTPUT_CSV = "../data/processed/clean_description.csv"
@@ -152,13 +157,21 @@ def transformation():
     names, drops unwanted columns, standardizes column names, and writes
     the transformed data to `OUTPUT_CSV`.
     """
-    df = load_data(INPUT_CSV)
-    df['description'] = df['description'].apply(clean_description)
-    df["Author_Editor"] = df["Author_Editor"].apply(clean_author)
+    with stage("load_data") as s:
+        df = load_data(INPUT_CSV)
+        s.rows_out = len(df)
+    with stage("clean_description", rows_in=len(df)) as s:
+        df['description'] = df['description'].apply(clean_description)
+        s.rows_out = int(df['description'].notna().sum())
+    with stage("clean_author", rows_in=len(df)):
+        df["Author_Editor"] = df["Author_Editor"].apply(clean_author)
     df = Format_col(df)
-    df = handle_ISBN(df)
+    with stage("handle_ISBN", rows_in=len(df)) as s:
+        df = handle_ISBN(df)
+        s.rows_out = len(df)
 
-    df.to_csv(OUTPUT_CSV, index=False)
+    with stage("save", rows_in=len(df)):
+        df.to_csv(OUTPUT_CSV, index=False)
     print("Transformation completed successfully")
     print(f"Rows before: {df.shape[0]}")
     # ... apply drop logic ...